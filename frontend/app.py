@@ -1,5 +1,6 @@
 import pygame
 import threading
+import queue
 import math
 import time
 import sys
@@ -13,72 +14,204 @@ from ruby.ruby_mainframe import Ruby
 # -------------------------------
 WIDTH, HEIGHT = 600, 600
 FPS = 60
+IDLE_FPS = 15
+
+# Worker retry delay after an error (seconds), doubled up to the max
+MIN_BACKOFF = 0.2
+MAX_BACKOFF = 30
 
 BG_COLOR = (18, 18, 24)
 IDLE_COLOR = (120, 120, 120)
 LISTENING_COLOR = (0, 180, 255)
 SPEAKING_COLOR = (255, 90, 90)
 THINKING_COLOR = (255, 255, 255)
+ERROR_COLOR = (200, 30, 30)
 
 
 # -------------------------------
 # PULSING CIRCLE
 # -------------------------------
 class PulseCircle:
-    def __init__(self, center, base_radius=60):
+    def __init__(self, center, base_radius=60, colors=(), max_pulse=15):
         self.center = center
         self.base_radius = base_radius
-        self.time = 0
+        self.start = time.monotonic()
+        # Pre-render one surface per (color, radius) so drawing is a plain blit
+        self.cache = {}
+        for color in colors:
+            for radius in range(base_radius - max_pulse, base_radius + max_pulse + 1):
+                surf = pygame.Surface((2 * radius + 4, 2 * radius + 4), pygame.SRCALPHA)
+                pygame.draw.circle(surf, color, (radius + 2, radius + 2), radius)
+                self.cache[(color, radius)] = surf.convert_alpha()
+
+    def radius(self, intensity=1.0):
+        # Driven by wall-clock time so the pulse speed does not depend on the frame rate
+        pulse = math.sin((time.monotonic() - self.start) * 3) * 10 * intensity
+        return int(self.base_radius + pulse)
 
-    def draw(self, screen, color, intensity=1.0):
-        self.time += 0.05
-        pulse = math.sin(self.time) * 10 * intensity
-        radius = int(self.base_radius + pulse)
-        pygame.draw.circle(screen, color, self.center, radius)
+    def draw(self, screen, color, radius):
+        surf = self.cache.get((color, radius))
+        if surf is None:
+            return pygame.draw.circle(screen, color, self.center, radius)
+        return screen.blit(surf, surf.get_rect(center=self.center))
 
 
 # -------------------------------
 # RUBY THREAD
 # -------------------------------
 class RubyWorker(threading.Thread):
-    def __init__(self, ruby):
+    """
+    Runs Ruby's listen -> think -> speak pipeline off the UI thread.
+
+    Each stage has its own thread connected by bounded queues, so the
+    microphone can capture the next utterance while the previous reply
+    is still being generated or played.
+    """
+    def __init__(self, ruby, queue_size=4):
         super().__init__(daemon=True)
         self.ruby = ruby
         self.running = True
+        self.stt_q = queue.Queue(maxsize=queue_size)   # user transcripts
+        self.tts_q = queue.Queue(maxsize=queue_size)   # reply sentences
+        # Tool fillers (Ruby.say) go through the speak stage too
+        ruby.speech_queue = self.tts_q
+        self.interrupt_event = threading.Event()
 
     def run(self):
+        stages = [
+            threading.Thread(target=self._listen_loop, daemon=True),
+            threading.Thread(target=self._think_loop, daemon=True),
+            threading.Thread(target=self._speak_loop, daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+    def _backoff(self, error, delay):
+        """Surface the error to the UI, wait, and return the next (doubled, capped) delay."""
+        print("Ruby error:", error)
+        self.ruby.last_error = str(error)
+        self.ruby.ruby_state = "Error"
+        time.sleep(delay)
+        return min(delay * 2, MAX_BACKOFF)
+
+    def _listen_loop(self):
+        delay = MIN_BACKOFF
         while self.running:
             try:
                 user_input = self.ruby.listen()
+                delay = MIN_BACKOFF
+                # Echo guard: anything finalized while Ruby is talking is most likely its
+                # own voice, so drop it; barge-in goes through interrupt() instead
+                if self.ruby.ruby_state == "Speaking" or not self.ruby.tts.wait(0):
+                    continue
                 if user_input:
-                    self.ruby.speak(user_input)
+                    self.stt_q.put(user_input)
+            except Exception as e:
+                delay = self._backoff(e, delay)
+
+    def _think_loop(self):
+        delay = MIN_BACKOFF
+        while self.running:
+            try:
+                user_input = self.stt_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.interrupt_event.clear()
+                for sentence in self.ruby.stream_reply(user_input):
+                    # Barge-in: drop the rest of the reply
+                    if self.interrupt_event.is_set() or not self.running:
+                        break
+                    self.tts_q.put(sentence)
+                delay = MIN_BACKOFF
             except Exception as e:
-                print("Ruby error:", e)
-                time.sleep(1)
+                delay = self._backoff(e, delay)
+
+    def _speak_loop(self):
+        delay = MIN_BACKOFF
+        while self.running:
+            try:
+                sentence = self.tts_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.interrupt_event.is_set():
+                continue
+            try:
+                self.ruby.ruby_state = "Speaking"
+                # Stop transcribing while Ruby talks, or it would answer its own voice
+                if hasattr(self.ruby.stt, "pause"):
+                    self.ruby.stt.pause()
+                # Queue behind the sentence still playing so playback is gapless
+                self.ruby.tts.text_to_speech(sentence, block=False)
+                # Fall back to listening once the reply is done.
+                # Poll rather than block, so the next sentence is synthesized while this one plays.
+                while self.tts_q.empty() and not self.ruby.tts.wait(timeout=0.05):
+                    pass
+                if self.tts_q.empty():
+                    self.ruby.ruby_state = "Listening"
+                    if hasattr(self.ruby.stt, "resume"):
+                        self.ruby.stt.resume()
+                delay = MIN_BACKOFF
+            except Exception as e:
+                if hasattr(self.ruby.stt, "resume"):
+                    self.ruby.stt.resume()
+                delay = self._backoff(e, delay)
+
+    def interrupt(self):
+        """Stop the current reply: drop queued sentences and silence playback."""
+        self.interrupt_event.set()
+        while True:
+            try:
+                self.tts_q.get_nowait()
+            except queue.Empty:
+                break
+        self.ruby.tts.stop()
 
     def stop(self):
         self.running = False
+        # Release the microphone and end the persistent recognize stream
+        if hasattr(self.ruby.stt, "close"):
+            self.ruby.stt.close()
 
 
 # -------------------------------
 # MAIN UI
 # -------------------------------
 def main():
-    pygame.init()
+    # Only the display and fonts are needed; the mixer would open the audio device TTS plays on
+    pygame.display.init()
+    pygame.font.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Ruby Voice Agent")
     clock = pygame.time.Clock()
 
     font = pygame.font.SysFont("Arial", 22)
+    # Pre-render every status label once instead of rasterizing text each frame
+    status_surfaces = {
+        text: font.render(text, True, (220, 220, 220))
+        for text in ("Listening...", "Speaking...", "Thinking...", "Playing Video...", "Searching Video...", "Idle")
+    }
+    # Error text varies, so only the latest error label is kept rendered
+    error_text, error_surface = None, None
 
     ruby = Ruby()
     worker = RubyWorker(ruby)
     worker.start()
-    pulse_circle = PulseCircle(center=(WIDTH // 2, HEIGHT // 2))
+    pulse_circle = PulseCircle(
+        center=(WIDTH // 2, HEIGHT // 2),
+        colors=(IDLE_COLOR, LISTENING_COLOR, SPEAKING_COLOR, THINKING_COLOR, ERROR_COLOR),
+    )
+
+    screen.fill(BG_COLOR)
+    pygame.display.flip()
+    last_frame = None
+    last_rects = []
 
     running = True
     while running:
-        clock.tick(FPS)
+        clock.tick(IDLE_FPS if last_frame and last_frame[0] == "Idle" else FPS)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -87,7 +220,7 @@ def main():
                 # Stop speaking immediately
                 if ruby.ruby_state == "Speaking":
                     print("🛑 Stopping TTS")
-                    ruby.tts.stop()
+                    worker.interrupt()
                     ruby.ruby_state = "Idel"
 
         # -----------------------
@@ -113,23 +246,41 @@ def main():
             color = THINKING_COLOR
             intensity = 1.2
             status_text = "Searching Video..."
+        elif ruby.ruby_state == "Error":
+            color = ERROR_COLOR
+            intensity = 0
+            status_text = f"Error: {ruby.last_error}"[:60]
         else:
             color = IDLE_COLOR
             intensity = 0.5
             status_text = "Idle"
 
         # -----------------------
-        # DRAW
+        # DRAW (only when something changed)
         # -----------------------
-        screen.fill(BG_COLOR)
+        radius = pulse_circle.radius(intensity)
+        frame = (status_text, color, radius)
+        if frame == last_frame:
+            continue
+        last_frame = frame
 
-        pulse_circle.draw(screen, color, intensity)
+        # Clear what was drawn last frame, then redraw circle and label
+        for rect in last_rects:
+            screen.fill(BG_COLOR, rect)
 
-        text_surface = font.render(status_text, True, (220, 220, 220))
+        circle_rect = pulse_circle.draw(screen, color, radius)
+
+        if status_text in status_surfaces:
+            text_surface = status_surfaces[status_text]
+        else:
+            if status_text != error_text:
+                error_text, error_surface = status_text, font.render(status_text, True, (220, 220, 220))
+            text_surface = error_surface
         text_rect = text_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 120))
         screen.blit(text_surface, text_rect)
 
-        pygame.display.flip()
+        pygame.display.update(last_rects + [circle_rect, text_rect])
+        last_rects = [circle_rect, text_rect]
 
     worker.stop()
     pygame.quit()
@@ -1,9 +1,13 @@
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
+import queue
 import sys
 import os
+import re
 
 # Ensure utils can be imported by adding parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -11,6 +15,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utiles.tts import RubyTTS
 from utiles.stt import RubySTT
 from utiles.prompt import system_prompt
+from utiles.openai_http import http_client, http_async_client
 from utiles.ruby_tools import (
     YouTubeVideoPlayerTool,
     GetAvailableLanguagesTool,
@@ -23,6 +28,32 @@ from utiles.toolbox import (
 )
 load_dotenv()
 
+# A sentence is complete once the buffer ends on terminal punctuation
+SENTENCE_END = re.compile(r"[.?!]\s*$")
+# Words whose period does not end the sentence
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "e.g.", "i.e."}
+# Flush long run-on replies to TTS even without punctuation
+MAX_SENTENCE_WORDS = 80
+
+
+def is_sentence_boundary(buffer, token):
+    """
+    Returns True if the buffered text ends a sentence and can be sent to TTS.
+
+    The model streams "3.14" as "3", ".", "14", so punctuation only ends a
+    sentence once the next token starts with whitespace (the stream end is
+    handled by the caller). Abbreviations such as "Dr." never end one.
+
+    Args:
+        buffer (str): Text received since the last sentence.
+        token (str): The token that follows `buffer`.
+    """
+    if not SENTENCE_END.search(buffer):
+        return False
+    if not (buffer[-1].isspace() or token[:1].isspace()):
+        return False
+    return buffer.split()[-1].lower() not in ABBREVIATIONS
+
 
 class Ruby:
     """
@@ -32,7 +63,8 @@ class Ruby:
     It integrates Speech-to-Text (STT), Text-to-Speech (TTS), and the LangChain 
     agent logic to handle user interactions and tool execution.
     """
-    def __init__(self, tts=None, model="gpt-4o", system_prompt=system_prompt, tools=[], stt=None):
+    def __init__(self, tts=None, model="gpt-4o", system_prompt=system_prompt, tools=[], stt=None,
+                 max_turns=8, max_history_chars=32_000, summary_model="gpt-4o-mini", warm_up=True):
         """
         Initialize the Ruby agent.
 
@@ -42,10 +74,28 @@ class Ruby:
             system_prompt: System instructions for the agent.
             tools: List of additional tools.
             stt: RubySTT instance (optional).
+            max_turns: Number of recent user/assistant turns kept verbatim in the history.
+            max_history_chars: Size budget for the verbatim turns; older turns are summarized beyond it.
+            summary_model: Cheap OpenAI model used to summarize evicted turns.
+            warm_up: Fire dummy requests at startup so the first utterance skips connection setup.
         """
         self.model_name = model
         self.ruby_state = "idel"
+        self.last_error = None
         self.system_prompt = system_prompt
+
+        # Sliding window memory: older turns are folded into a running summary
+        self.max_turns = max_turns
+        self.max_history_chars = max_history_chars
+        self._history_chars = 0  # Running size of the verbatim turns sent each request
+        self.summary = ""
+        self._evicted = []
+        self._summary_thread = None  # Summaries run in the background, one at a time
+        self.summarizer = ChatOpenAI(
+            model_name=summary_model,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
         
         # Combine default built-in tools with any extra tools provided
         self.tools = [
@@ -70,42 +120,227 @@ class Ruby:
             self.stt = stt
 
         self.system_prompt = system_prompt
-        # Initialize conversation history with the system prompt
-        self.chat_history = {"messages": [SystemMessage(content=self.system_prompt)]}
+        # Conversation turns only: the agent prepends the static system prompt itself,
+        # so the request prefix (tools + system prompt) is byte-identical every turn
+        # and stays eligible for OpenAI prompt caching.
+        self.chat_history = {"messages": []}
+        self.last_usage = None
+        # Sentence queue of the active speak stage, used by say()
+        self.speech_queue = None
         
         # Create the LangChain agent
         self.model = create_agent(
-            model=ChatOpenAI(model_name=self.model_name),
+            model=ChatOpenAI(
+                model_name=self.model_name,
+                streaming=True,
+                stream_usage=True,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            ),
             tools=self.tools,
             system_prompt=self.system_prompt,
         )
+        # Tool calls from one model step run concurrently on a thread pool of this size
+        self.agent_config = {"max_concurrency": 4}
+
+        if warm_up:
+            self._warm_up()
+
+    def _warm_up(self, timeout=5):
+        """
+        Open the OpenAI, TTS and STT connections (and start tool helpers such as the
+        video player) concurrently before the first turn.
+
+        Blocks for at most `timeout` seconds; failures are only logged since the
+        real calls will simply pay the setup cost instead.
+        """
+        tasks = [lambda: self.model.invoke({"messages": [HumanMessage(content="ping")]})]
+        for component in (self.tts, self.stt, *self.tools):
+            if hasattr(component, "warm_up"):
+                tasks.append(component.warm_up)
+
+        executor = ThreadPoolExecutor(max_workers=len(tasks))
+        futures = [executor.submit(task) for task in tasks]
+        done, _ = wait(futures, timeout=timeout)
+        executor.shutdown(wait=False)
+        for future in done:
+            if future.exception() is not None:
+                print("Warm-up error:", future.exception())
+
+    def stream_reply(self, user_input):
+        """
+        Stream the agent's reply to user input one sentence at a time.
+
+        Tokens from the model are buffered until a sentence boundary (or
+        MAX_SENTENCE_WORDS) is reached, so speech can start while the model
+        is still generating. The assembled reply is appended to the history
+        once the stream ends (or is closed early).
+
+        Args:
+            user_input (str): The user's transcribed message.
+
+        Yields:
+            str: Completed sentences of the reply.
+        """
+        self.ruby_state = "Thinking"
+        self._append_history(HumanMessage(content=user_input))
+
+        # Dynamic context goes after the static prefix, never into the system prompt
+        agent_input = {"messages": self._context_messages() + self.chat_history["messages"]}
+
+        reply = []
+        buffer = ""
+        try:
+            for token, _ in self.model.stream(agent_input, self.agent_config, stream_mode="messages"):
+                # Only forward text generated by the model, not tool calls or tool outputs
+                if not isinstance(token, AIMessage) or not isinstance(token.content, str):
+                    continue
+                if token.usage_metadata:
+                    # input_token_details.cache_read shows how much of the prefix was cached
+                    self.last_usage = token.usage_metadata
+                if not token.content:
+                    continue
+                # A sentence is flushed when the token after it arrives, or when the stream ends
+                if is_sentence_boundary(buffer, token.content) or len(buffer.split()) > MAX_SENTENCE_WORDS:
+                    reply.append(buffer)
+                    sentence, buffer = buffer.strip(), ""
+                    if sentence:
+                        yield sentence
+                buffer += token.content
+            if buffer.strip():
+                reply.append(buffer)
+                yield buffer.strip()
+        finally:
+            # Add agent's response to history once, even if playback was interrupted
+            # Only the spoken text is kept: tool calls and tool outputs never enter the history
+            text = "".join(reply).strip()
+            if text:
+                self._append_history(AIMessage(content=text))
+            else:
+                # Nothing was said (e.g. the model call failed): drop the unanswered
+                # user turn so history keeps user/assistant pairs and no empty reply is resent
+                self._pop_history()
+            self._trim_history()
+
+    def _append_history(self, message):
+        """Append a turn message and account for its size."""
+        self.chat_history["messages"].append(message)
+        self._history_chars += len(message.content)
+
+    def _pop_history(self):
+        """Remove the most recent message and its size from the history."""
+        message = self.chat_history["messages"].pop()
+        self._history_chars -= len(message.content)
+
+    def _context_messages(self):
+        """Returns the running summary as a message placed after the static system prompt."""
+        if not self.summary:
+            return []
+        return [SystemMessage(content="Context so far: " + self.summary)]
+
+    def _trim_history(self):
+        """
+        Keep the history to the last `max_turns` turns and `max_history_chars` characters.
+
+        The oldest user/assistant pair is evicted once either budget is exceeded
+        (the latest turn is always kept), and every 4 evicted pairs are summarized
+        into `self.summary`, which is sent ahead of the recent turns so the prompt
+        size stays bounded. The summary is written on a background thread, so the
+        next turn does not wait for it.
+        """
+        messages = self.chat_history["messages"]
+        while len(messages) > 2 * self.max_turns or (
+            self._history_chars > self.max_history_chars and len(messages) > 2
+        ):
+            self._history_chars -= sum(len(msg.content) for msg in messages[0:2])
+            self._evicted.extend(messages[0:2])
+            del messages[0:2]
+
+        if len(self._evicted) >= 8 and (self._summary_thread is None or not self._summary_thread.is_alive()):
+            self._summary_thread = threading.Thread(target=self._summarize_evicted, daemon=True)
+            self._summary_thread.start()
+
+    def _summarize_evicted(self):
+        """Fold the evicted turns into the running conversation summary."""
+        evicted = self._evicted
+        turns = list(evicted) # Turns evicted while the summary is written wait for the next one
+        transcript = "\n".join(
+            f"{'User' if isinstance(msg, HumanMessage) else 'Ruby'}: {msg.content}"
+            for msg in turns
+        )
+        prompt = (
+            "Update the summary of this conversation between a user and Ruby. "
+            "Keep names, preferences, the active language and open tasks. Reply with the summary only.\n\n"
+            f"Current summary: {self.summary or 'None'}\n\nNew turns:\n{transcript}"
+        )
+        try:
+            summary = self.summarizer.invoke(prompt).content.strip()
+        except Exception as e:
+            # Keep the evicted turns and retry on the next eviction
+            print("Summary error:", e)
+            return
+        # reset() may have started a new conversation in the meantime
+        if evicted is self._evicted:
+            self.summary = summary
+            del evicted[:len(turns)]
+
+    def _tts_worker(self, sentences):
+        """Play queued sentences in order until a None sentinel is received."""
+        while True:
+            sentence = sentences.get()
+            if sentence is None:
+                break
+            self.ruby_state = "Speaking"
+            # Queue behind the sentence still playing so playback is gapless
+            self.tts.text_to_speech(sentence, block=False)
+        self.tts.wait()
 
     def speak(self, user_input):
         """
-        Process user input and generate a response.
+        Process user input and speak the response as it is generated.
         
         1. Updates state to 'Thinking'.
         2. Appends user input to history.
-        3. Invokes model to get response.
-        4. Updates state to 'Speaking' and plays audio.
+        3. Streams the model response sentence by sentence.
+        4. Hands each sentence to a single TTS worker thread, which keeps playback in order.
         5. Returns text response.
+
+        STT is paused until playback ends, so Ruby's own voice is not heard as user input.
         """
-        self.ruby_state = "Thinking"
-        self.chat_history["messages"].append(HumanMessage(content=user_input))
-        
-        # Get response from the agent
-        response = self.model.invoke(self.chat_history)
-        
-        # Add agent's response to history
-        self.chat_history["messages"].append(response["messages"][-1])
-        
-        self.ruby_state = "Speaking"
-        # Synthesis speech from the text response
-        self.tts.text_to_speech(response["messages"][-1].content)
-        
+        if hasattr(self.stt, "pause"):
+            self.stt.pause()
+        sentences = queue.Queue()
+        tts_thread = threading.Thread(target=self._tts_worker, args=(sentences,), daemon=True)
+        tts_thread.start()
+        self.speech_queue = sentences
+
+        reply = []
+        try:
+            for sentence in self.stream_reply(user_input):
+                reply.append(sentence)
+                sentences.put(sentence)
+        finally:
+            self.speech_queue = None
+            sentences.put(None)
+            tts_thread.join()
+            if hasattr(self.stt, "resume"):
+                self.stt.resume()
+
         self.ruby_state = "idel"
-        return response["messages"][-1].content
+        return " ".join(reply)
     
+    def say(self, text):
+        """
+        Speak text that is not part of the model's reply, such as a tool's filler.
+
+        It goes through the active speak stage, so it plays after the reply sentences
+        already queued instead of overlapping them; with no stage running it is played directly.
+        """
+        if self.speech_queue is not None:
+            self.speech_queue.put(text)
+        else:
+            self.tts.text_to_speech(text, block=False)
+
     def listen(self):
         """
         Listen for user audio input.
@@ -118,8 +353,11 @@ class Ruby:
         return transcript
 
     def reset(self):
-        """Reset the conversation history to the initial system prompt."""
-        self.chat_history = {"messages": [SystemMessage(content=self.system_prompt)]}
+        """Reset the conversation history."""
+        self.chat_history = {"messages": []}
+        self._history_chars = 0
+        self.summary = ""
+        self._evicted = []
         self.ruby_state = "idel"
 
     def run(self):
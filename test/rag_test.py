@@ -2,6 +2,7 @@ import unittest
 import sys
 import os
 import shutil
+from unittest.mock import MagicMock
 from dotenv import load_dotenv
 
 # Add project root to path to ensure modules are found
@@ -33,6 +34,9 @@ class TestRubyRAG(unittest.TestCase):
 
     def tearDown(self):
         """Clean up test fixtures after each test method."""
+        # Let background saves finish before removing their folder
+        if hasattr(self, "rag"):
+            self.rag.flush()
         # Remove the temporary vector DB folder
         if os.path.exists(self.test_db_path):
             shutil.rmtree(self.test_db_path)
@@ -57,6 +61,9 @@ class TestRubyRAG(unittest.TestCase):
         # Check if vectorstore was created
         self.assertIsNotNone(self.rag.vectorstore)
         
+        # Saves are written in the background; wait for them
+        self.rag.flush()
+        
         # Check if persistence directory was created
         self.assertTrue(os.path.exists(self.test_db_path))
         self.assertTrue(os.path.exists(os.path.join(self.test_db_path, "index.faiss")))
@@ -90,6 +97,7 @@ class TestRubyRAG(unittest.TestCase):
         
         # 1. Create and save data
         self.rag.add_documents(self.test_file)
+        self.rag.flush()
         del self.rag # Simulate restart
         
         # 2. Reload from same path
@@ -102,5 +110,37 @@ class TestRubyRAG(unittest.TestCase):
         response = new_rag.query("What is Ruby designed for?")
         self.assertIn("education", response)
 
+    def test_06_add_folder(self):
+        """Test Case 6: Batch Ingestion of a Folder"""
+        print("\n[Test 6] Verifying Folder Ingestion...")
+        nested_dir = os.path.join(self.test_docs_path, "nested")
+        os.makedirs(nested_dir, exist_ok=True)
+        with open(os.path.join(nested_dir, "maker.md"), "w", encoding="utf-8") as f:
+            f.write("Ruby is manufactured by Mensch Robotics in Coimbatore.\n")
+        
+        # Both the top-level .txt and the nested .md are ingested in one call
+        self.rag.add_documents(self.test_docs_path)
+        
+        response = self.rag.query("Who manufactures Ruby?")
+        self.assertIn("Coimbatore", response)
+
+    def test_07_failed_save_is_retried(self):
+        """Test Case 7: A failed background save does not block later saves"""
+        print("\n[Test 7] Verifying Save Failure Recovery...")
+        self.rag.save_delay = 0.01
+        self.rag.vectorstore = MagicMock()
+        self.rag.vectorstore.save_local.side_effect = [OSError("disk full"), None]
+        
+        # The failing write ends the writer; flush() must still return
+        self.rag._schedule_save()
+        self.rag.flush()
+        self.assertTrue(self.rag._save_pending)
+        
+        # The next save starts a new writer and succeeds
+        self.rag._schedule_save()
+        self.rag.flush()
+        self.assertEqual(self.rag.vectorstore.save_local.call_count, 2)
+        self.assertFalse(self.rag._save_pending)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import queue
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from ruby.ruby_mainframe import Ruby, is_sentence_boundary
+
+class TestRuby(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures. Mock the OpenAI models, TTS and STT."""
+        self.patcher_chat = patch('ruby.ruby_mainframe.ChatOpenAI')
+        self.mock_chat = self.patcher_chat.start()
+        self.patcher_agent = patch('ruby.ruby_mainframe.create_agent')
+        self.mock_agent = self.patcher_agent.start()
+
+        self.ruby = Ruby(tts=MagicMock(), stt=MagicMock(), warm_up=False)
+
+    def tearDown(self):
+        self.patcher_chat.stop()
+        self.patcher_agent.stop()
+
+    def _stream(self, *tokens):
+        """Make the agent stream `tokens` as model message chunks."""
+        self.ruby.model.stream.return_value = iter(
+            [(AIMessageChunk(content=token), {}) for token in tokens]
+        )
+
+    def test_01_sentence_boundary(self):
+        """Test Case 1: Sentence Boundaries"""
+        print("\n[Test 1] Verifying Sentence Boundaries...")
+        self.assertTrue(is_sentence_boundary("It is 3.", " Next"))
+        self.assertTrue(is_sentence_boundary("Done!\n", "Next"))
+        # Decimals and abbreviations do not end a sentence
+        self.assertFalse(is_sentence_boundary("It is 3.", "14"))
+        self.assertFalse(is_sentence_boundary("Ask Dr.", " Rao"))
+        self.assertFalse(is_sentence_boundary("No punctuation", " yet"))
+
+    def test_02_stream_reply_sentences(self):
+        """Test Case 2: Streamed tokens are split into sentences"""
+        print("\n[Test 2] Verifying Streamed Sentences...")
+        self._stream("The answer is ", "3", ".", "14", " meters", ".", " Dr", ".", " Rao agrees", ".")
+        sentences = list(self.ruby.stream_reply("How far?"))
+
+        self.assertEqual(sentences, ["The answer is 3.14 meters.", "Dr. Rao agrees."])
+        messages = self.ruby.chat_history["messages"]
+        self.assertEqual([msg.content for msg in messages], ["How far?", "The answer is 3.14 meters. Dr. Rao agrees."])
+
+    def _add_turns(self, count, size=10):
+        """Append `count` user/assistant pairs of `size` characters each and trim."""
+        for i in range(count):
+            self.ruby._append_history(HumanMessage(content=str(i) * size))
+            self.ruby._append_history(AIMessage(content=str(i) * size))
+            self.ruby._trim_history()
+
+    def test_03_trim_history_turns(self):
+        """Test Case 3: Oldest user/assistant pairs are evicted beyond max_turns"""
+        print("\n[Test 3] Verifying Turn Eviction...")
+        self.ruby.max_turns = 2
+        self._add_turns(3)
+
+        messages = self.ruby.chat_history["messages"]
+        self.assertEqual([msg.content for msg in messages], ["1" * 10, "1" * 10, "2" * 10, "2" * 10])
+        self.assertIsInstance(messages[0], HumanMessage)
+        self.assertEqual(self.ruby._history_chars, 40)
+        self.assertEqual(len(self.ruby._evicted), 2)
+
+    def test_04_trim_history_chars(self):
+        """Test Case 4: Pairs are evicted beyond max_history_chars, keeping the latest turn"""
+        print("\n[Test 4] Verifying Size Eviction...")
+        self.ruby.max_history_chars = 50
+        self._add_turns(3, size=20)
+        self.assertEqual(len(self.ruby.chat_history["messages"]), 2)
+        self.assertEqual(self.ruby._history_chars, 40)
+
+        # A single turn over budget is still kept
+        self._add_turns(1, size=100)
+        self.assertEqual(len(self.ruby.chat_history["messages"]), 2)
+        self.assertEqual(self.ruby._history_chars, 200)
+
+    def test_05_failed_stream_pops_user_turn(self):
+        """Test Case 5: A reply that failed before any text leaves no unanswered turn"""
+        print("\n[Test 5] Verifying Failed Stream...")
+        self._add_turns(1)
+        self.ruby.model.stream.side_effect = RuntimeError("connection reset")
+        with self.assertRaises(RuntimeError):
+            list(self.ruby.stream_reply("Hello?"))
+
+        self.assertEqual(len(self.ruby.chat_history["messages"]), 2)
+        self.assertEqual(self.ruby._history_chars, 20)
+
+    def test_06_summary_in_background(self):
+        """Test Case 6: Evicted turns are summarized off the reply path and kept until it succeeds"""
+        print("\n[Test 6] Verifying Background Summary...")
+        self.ruby.max_turns = 1
+        self.ruby.summarizer.invoke.side_effect = RuntimeError("rate limited")
+        self._add_turns(5)
+        self.ruby._summary_thread.join(2)
+        self.assertEqual(self.ruby.summary, "")
+        self.assertEqual(len(self.ruby._evicted), 8)
+
+        # The next eviction retries with every turn still pending
+        self.ruby.summarizer.invoke.side_effect = None
+        self.ruby.summarizer.invoke.return_value = AIMessage(content="User said numbers.")
+        self._add_turns(1)
+        self.ruby._summary_thread.join(2)
+        self.assertEqual(self.ruby.summary, "User said numbers.")
+        self.assertEqual(self.ruby._evicted, [])
+        self.assertIn("0000000000", self.ruby.summarizer.invoke.call_args.args[0])
+
+    def test_07_say_goes_through_speak_stage(self):
+        """Test Case 7: Tool fillers queue behind the reply, in the active language"""
+        print("\n[Test 7] Verifying say()...")
+        self.ruby.say("Hello")
+        self.ruby.tts.text_to_speech.assert_called_once_with("Hello", block=False)
+
+        sentences = queue.Queue()
+        sentences.put("First reply sentence.")
+        self.ruby.speech_queue = sentences
+        self.ruby.tts.language_code = "ta-IN"
+        self.ruby.tools[0]._announce_search()
+        self.assertEqual(sentences.get_nowait(), "First reply sentence.")
+        self.assertEqual(sentences.get_nowait(), "அந்த வீடியோவைத் தேடுகிறேன்.")
+        self.ruby.tts.text_to_speech.assert_called_once()
+
+if __name__ == "__main__":
+    unittest.main()
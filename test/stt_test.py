@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import sys
+import threading
 import os
 
 # Add project root to path
@@ -16,15 +17,23 @@ class TestRubySTT(unittest.TestCase):
         self.mock_client_class = self.patcher_client.start()
         
         # Patch sounddevice to prevent microphone access
-        self.patcher_sd = patch('utiles.stt.sd.InputStream')
+        self.patcher_sd = patch('utiles.stt.sd.RawInputStream')
         self.mock_sd = self.patcher_sd.start()
 
         self.stt = RubySTT()
 
     def tearDown(self):
+        self.stt.close()
         self.patcher_client.stop()
         self.patcher_sd.stop()
 
+    def _serve(self, *responses):
+        """Make the recognize stream yield `responses`, then stay open until the session closes."""
+        def streaming_recognize(config=None, requests=None):
+            yield from responses
+            self.stt._closed.wait(5)
+        self.stt.client.streaming_recognize.side_effect = streaming_recognize
+
     def test_01_initialization(self):
         """Test Case 1: Initialization Default Values"""
         print("\n[Test 1] Verifying Initialization...")
@@ -39,33 +48,66 @@ class TestRubySTT(unittest.TestCase):
         self.stt.update_language("ml-IN")
         
         self.assertEqual(self.stt.language_code, "ml-IN")
-        # Check if client was re-initialized
-        self.assertTrue(self.mock_client_class.call_count >= 2)
+        # Client (and its gRPC channel) is reused, not re-initialized
+        self.assertEqual(self.mock_client_class.call_count, 1)
         
         # Verify config uses new language
         self.assertEqual(self.stt.recognition_config.language_code, "ml-IN")
+        self.assertEqual(self.stt.streaming_config.config.language_code, "ml-IN")
 
     def test_03_audio_stream_logic(self):
         """Test Case 3: Audio Stream Generator"""
         print("\n[Test 3] Verifying Audio Stream Generator...")
-        # Mock the stream context manager
-        mock_stream_instance = self.mock_sd.return_value.__enter__.return_value
-        # mock stream.read returning (data, overflow)
-        # return 2 chunks then raise unexpected error or just 2 chunks for manual iteration
-        mock_stream_instance.read.side_effect = [(b'chunk1', False), (b'chunk2', False), Exception("End")]
+        # Simulate the audio thread delivering 2 blocks before the generator runs
+        self.stt._capture_callback(b'chunk1', 3, None, None)
+        self.stt._capture_callback(b'chunk2', 3, None, None)
         
         generator = self.stt._audio_stream()
         
-        try:
-            chunk1 = next(generator)
-            chunk2 = next(generator)
-            self.assertEqual(chunk1, b'chunk1')
-            self.assertEqual(chunk2, b'chunk2')
-        except Exception:
-            pass # Expected end of sequence for this test
-
-    @patch('utiles.stt.speech.StreamingRecognizeRequest')
-    def test_04_listen_success(self, mock_request):
+        # Blocks queued before the generator ran are batched into one chunk
+        chunk = next(generator)
+        self.assertEqual(chunk, b'chunk1chunk2')
+        self.assertIsInstance(chunk, bytes)
+        
+        # A backlog is split at the per-request size limit
+        block = bytes(3200)
+        for _ in range(10):
+            self.stt._capture_callback(block, 1600, None, None)
+        self.assertEqual(len(next(generator)), 25_600)
+        self.assertEqual(len(next(generator)), 6_400)
+        generator.close()
+        
+        # A stop event ends the generator
+        stop = threading.Event()
+        stop.set()
+        self.assertEqual(list(self.stt._audio_stream(stop)), [])
+
+    def test_03a_callback_reuses_slots(self):
+        """Test Case 3a: Audio Callback copies into preallocated slots"""
+        print("\n[Test 3a] Verifying Preallocated Capture Slots...")
+        slots = list(self.stt._slots)
+        block = bytes(range(200)) * 16  # one 1600-frame int16 block
+        for _ in range(len(slots) + 1):
+            self.stt._capture_callback(block, 1600, None, None)
+        
+        # Slots are filled in place and reused round-robin
+        self.assertTrue(all(a is b for a, b in zip(slots, self.stt._slots)))
+        self.assertIs(self.stt._ring[-1], slots[0])
+        self.assertEqual(len(self.stt._ring), self.stt._ring.maxlen)
+        self.assertEqual(bytes(self.stt._ring[-1]), block)
+
+    def test_03b_requests_reuse(self):
+        """Test Case 3b: Request Generator reuses one request object"""
+        print("\n[Test 3b] Verifying Request Reuse...")
+        with patch.object(self.stt, '_audio_stream', return_value=iter([b'chunk1', b'chunk2'])):
+            requests = self.stt._requests()
+            first = next(requests)
+            self.assertEqual(first.audio_content, b'chunk1')
+            second = next(requests)
+            self.assertIs(first, second)
+            self.assertEqual(second.audio_content, b'chunk2')
+
+    def test_04_listen_success(self):
         """Test Case 4: Successful Transcription"""
         print("\n[Test 4] Verifying Success Transcription...")
         
@@ -77,13 +119,17 @@ class TestRubySTT(unittest.TestCase):
         mock_response.results = [mock_result]
         
         # Mocking streaming_recognize to return our mock list of responses
-        self.stt.client.streaming_recognize.return_value = [mock_response]
-        
-        # Mock _audio_stream so it returns immediately (don't need real loop)
-        with patch.object(self.stt, '_audio_stream', return_value=iter([b'audio_data'])):
-            transcript = self.stt.listen()
+        self._serve(mock_response)
+        transcript = self.stt.listen(timeout=2)
             
         self.assertEqual(transcript, "Hello Ruby")
+        # The session opened the microphone once with 100 ms blocks
+        self.assertEqual(self.mock_sd.call_args.kwargs["dtype"], "int16")
+        self.assertEqual(self.mock_sd.call_args.kwargs["blocksize"], 1600)
+        
+        # The same stream is reused for the next utterance
+        self.assertEqual(self.stt.listen(timeout=0.05), "")
+        self.stt.client.streaming_recognize.assert_called_once()
         print(f"   Transcribed: {transcript}")
 
     def test_05_listen_no_result(self):
@@ -94,12 +140,134 @@ class TestRubySTT(unittest.TestCase):
         mock_response = MagicMock()
         mock_response.results = []
         
-        self.stt.client.streaming_recognize.return_value = [mock_response]
-        
-        with patch.object(self.stt, '_audio_stream', return_value=iter([b'audio_data'])):
-            transcript = self.stt.listen()
+        self._serve(mock_response)
+        transcript = self.stt.listen(timeout=0.1)
             
         self.assertEqual(transcript, "")
 
+    def test_06_listen_stable_interim(self):
+        """Test Case 6: Stable interim hypothesis is accepted early"""
+        print("\n[Test 6] Verifying Stable Interim Acceptance...")
+        self.stt.stable_dwell_ms = 20
+        mock_result = MagicMock()
+        mock_result.is_final = False
+        mock_result.stability = 0.9
+        mock_result.alternatives[0].transcript = "Play a song"
+        mock_response = MagicMock()
+        mock_response.results = [mock_result]
+
+        # The server sends one interim hypothesis and then nothing until the final
+        self._serve(mock_response)
+        transcript = self.stt.listen(timeout=2)
+
+        self.assertEqual(transcript, "Play a song")
+        self.assertEqual(self.stt._accepted, "Play a song")
+
+    def _final(self, transcript):
+        """Build a recognize response carrying a final result."""
+        result = MagicMock()
+        result.is_final = True
+        result.alternatives[0].transcript = transcript
+        response = MagicMock()
+        response.results = [result]
+        return response
+
+    def test_06a_final_after_stable_interim(self):
+        """Test Case 6a: The final of an accepted interim only yields the new words"""
+        print("\n[Test 6a] Verifying Final After Stable Interim...")
+        # Same words: dropped, the next utterance is returned
+        self.stt._accepted = "Play a song"
+        self._serve(self._final("Play a song."), self._final("Stop"))
+        self.assertEqual(self.stt.listen(timeout=1), "Stop")
+        self.assertIsNone(self.stt._accepted)
+        self.stt.close()
+
+        # The user kept talking after the pause: only the tail is returned
+        self.stt._accepted = "Play a song"
+        self._serve(self._final("Play a song by the Beatles"))
+        self.assertEqual(self.stt.listen(timeout=1), "by the Beatles")
+        self.stt.close()
+
+        # Punctuation and case added by the final do not make it a new utterance
+        self.stt._accepted = "hi ruby how are you"
+        self._serve(self._final("Hi Ruby, how are you?"), self._final("Stop"))
+        self.assertEqual(self.stt.listen(timeout=1), "Stop")
+        self.stt._accepted = "hi ruby how are you"
+        self.assertEqual(self.stt._after_accepted("Hi Ruby, how are you? Play music."), "Play music.")
+
+    def test_06b_drain_keeps_next_final(self):
+        """Test Case 6b: A drained final does not swallow the next utterance"""
+        print("\n[Test 6b] Verifying Drain...")
+        self._serve()
+        self.stt._accepted = "Play a song"
+        self.stt._updates.put(("Play a song.", True, 1.0))
+        self.stt.listen(timeout=0.01) # Drains the stale final
+        self.assertIsNone(self.stt._accepted)
+
+        # Stream errors queued between calls are raised, not dropped
+        self.stt._updates.put(RuntimeError("stream failed"))
+        with self.assertRaises(RuntimeError):
+            self.stt.listen(timeout=0.01)
+
+    def test_07_stream_rotation(self):
+        """Test Case 7: Stream is replaced before Google's time limit"""
+        print("\n[Test 7] Verifying Stream Rotation...")
+        self.stt.stream_limit = 0.05
+        def streaming_recognize(config=None, requests=None):
+            # Consume requests like gRPC does; they end when the stream is rotated
+            for _ in requests:
+                pass
+            return iter([])
+        self.stt.client.streaming_recognize.side_effect = streaming_recognize
+
+        self.assertEqual(self.stt.listen(timeout=0.3), "")
+        self.assertGreater(self.stt.client.streaming_recognize.call_count, 1)
+
+    def test_08_microphone_error(self):
+        """Test Case 8: Microphone and session failures reach listen()"""
+        print("\n[Test 8] Verifying Session Errors...")
+        # A microphone that cannot be opened is reported, and the session keeps retrying
+        self.mock_sd.side_effect = OSError("no input device")
+        with self.assertRaises(OSError):
+            self.stt.listen(timeout=2)
+        self.assertTrue(self.stt._session.is_alive())
+        self.stt.close()
+
+        # A session thread that exits is not waited on forever
+        self.mock_sd.side_effect = None
+        with patch.object(self.stt, '_run_session', return_value=None):
+            with self.assertRaises(RuntimeError):
+                self.stt.listen(timeout=2)
+
+    def test_09_pause_during_playback(self):
+        """Test Case 9: Speech heard while paused never reaches listen()"""
+        print("\n[Test 9] Verifying Pause...")
+        paused = threading.Event()
+        calls = []
+        def streaming_recognize(config=None, requests=None):
+            calls.append(config)
+            if len(calls) == 1:
+                # Google finalizes Ruby's last words only after the pause
+                paused.wait(2)
+                yield self._final("Ruby's own sentence")
+            else:
+                yield self._final("Hello")
+            # Consume requests like gRPC does; they end when the stream is ended
+            for _ in requests:
+                pass
+        self.stt.client.streaming_recognize.side_effect = streaming_recognize
+
+        self.assertEqual(self.stt.listen(timeout=0.05), "")
+        self.stt.pause()
+        paused.set()
+        self.stt._capture_callback(b'chunk1', 3, None, None)
+        self.assertEqual(len(self.stt._ring), 0)
+        self.assertEqual(self.stt.listen(timeout=0.2), "")
+
+        # Resuming opens a fresh stream
+        self.stt.resume()
+        self.assertEqual(self.stt.listen(timeout=2), "Hello")
+        self.assertEqual(len(calls), 2)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utiles.stt_whisper import WhisperSTT
+
+class TestWhisperSTT(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures. Mock the model and microphone to avoid downloads/hardware."""
+        self.patcher_model = patch('utiles.stt_whisper.WhisperModel')
+        self.mock_model_class = self.patcher_model.start()
+
+        self.patcher_sd = patch('utiles.stt_whisper.sd.InputStream')
+        self.mock_sd = self.patcher_sd.start()
+
+        self.stt = WhisperSTT(chunk=4, silence_ms=1, sample_rate=1000)
+
+    def tearDown(self):
+        self.patcher_model.stop()
+        self.patcher_sd.stop()
+
+    def test_01_initialization(self):
+        """Test Case 1: Initialization Default Values"""
+        print("\n[Test 1] Verifying Initialization...")
+        self.assertEqual(self.stt.language_code, "en-IN")
+        self.mock_model_class.assert_called_with("base", device="cpu", compute_type="int8")
+
+    def test_02_update_language(self):
+        """Test Case 2: Language Switching"""
+        print("\n[Test 2] Verifying Language Update...")
+        self.stt.update_language("ta-IN")
+        self.assertEqual(self.stt.language_code, "ta-IN")
+
+    def test_03_record_utterance(self):
+        """Test Case 3: Recording stops after trailing silence"""
+        print("\n[Test 3] Verifying Utterance Endpointing...")
+        quiet = np.zeros((4, 1), dtype=np.int16)
+        loud = np.full((4, 1), 8000, dtype=np.int16)
+        mock_stream = self.mock_sd.return_value.__enter__.return_value
+        mock_stream.read.side_effect = [(quiet, False), (loud, False), (loud, False), (quiet, False)]
+
+        audio = self.stt._record_utterance()
+
+        # Pre-roll silence + two loud blocks + trailing silence
+        self.assertEqual(audio.dtype, np.float32)
+        self.assertEqual(len(audio), 16)
+        self.assertAlmostEqual(float(audio.max()), 8000 / 32768.0)
+
+    def test_04_listen_success(self):
+        """Test Case 4: Successful Transcription"""
+        print("\n[Test 4] Verifying Success Transcription...")
+        segment = MagicMock()
+        segment.text = " Hello Ruby "
+        self.stt.model.transcribe.return_value = ([segment], MagicMock())
+
+        with patch.object(self.stt, '_record_utterance', return_value=np.zeros(16, dtype=np.float32)):
+            transcript = self.stt.listen()
+
+        self.assertEqual(transcript, "Hello Ruby")
+        kwargs = self.stt.model.transcribe.call_args.kwargs
+        self.assertEqual(kwargs["beam_size"], 1)
+        self.assertTrue(kwargs["vad_filter"])
+        self.assertEqual(kwargs["language"], "en")
+
+if __name__ == "__main__":
+    unittest.main()
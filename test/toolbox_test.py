@@ -0,0 +1,42 @@
+import unittest
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utiles.toolbox import calculator
+
+class TestCalculator(unittest.TestCase):
+    def _calc(self, expression):
+        return calculator.invoke({"query": expression})
+
+    def test_01_arithmetic(self):
+        """Test Case 1: Basic Arithmetic"""
+        print("\n[Test 1] Verifying Arithmetic...")
+        self.assertEqual(self._calc("2 + 3 * 4"), "14")
+        self.assertEqual(self._calc("(1 + 2) / 3"), "1.0")
+        self.assertEqual(self._calc("-2 ** -2"), "-0.25")
+        self.assertEqual(self._calc("2 ** 100"), str(2 ** 100))
+
+    def test_02_rejects_code(self):
+        """Test Case 2: Names, calls and strings are rejected"""
+        print("\n[Test 2] Verifying Code Rejection...")
+        self.assertIn("Unsupported syntax", self._calc("__import__('os')"))
+        self.assertIn("Unsupported constant", self._calc("'a' * 3"))
+
+    def test_03_nested_power(self):
+        """Test Case 3: Nested powers cannot build huge integers"""
+        print("\n[Test 3] Verifying Power Bound...")
+        self.assertIn("too large", self._calc("9**9**9"))
+        self.assertIn("too large", self._calc("((((9**100)**100)**100)**100)"))
+
+    def test_04_tuple_repeat(self):
+        """Test Case 4: Tuples cannot be repeated"""
+        print("\n[Test 4] Verifying Tuple Repetition...")
+        self.assertIn("cannot be repeated", self._calc("(0,)*10**9"))
+        self.assertIn("cannot be repeated", self._calc("10**9*((0,)+(1,))"))
+        self.assertEqual(self._calc("1, 2"), "(1, 2)")
+
+if __name__ == "__main__":
+    unittest.main()
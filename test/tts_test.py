@@ -1,7 +1,11 @@
 import unittest
-from unittest.mock import MagicMock, patch, mock_open
+from unittest.mock import MagicMock, patch
 import sys
 import os
+import io
+import tempfile
+import wave
+import numpy as np
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -15,20 +19,18 @@ class TestRubyTTS(unittest.TestCase):
         self.patcher_client = patch('utiles.tts.texttospeech.TextToSpeechClient')
         self.mock_client_class = self.patcher_client.start()
 
-        # Patch Pygame
-        self.patcher_pygame = patch('utiles.tts.pygame')
-        self.mock_pygame = self.patcher_pygame.start()
-        
-        # Patch OS operations to avoid file creation
-        self.patcher_os = patch('utiles.tts.os')
-        self.mock_os = self.patcher_os.start()
+        # Patch sounddevice to prevent opening an audio device
+        self.patcher_sd = patch('utiles.tts.sd')
+        self.mock_sd = self.patcher_sd.start()
 
-        self.tts = RubyTTS()
+        # Keep the phrase cache out of the working tree
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.tts = RubyTTS(cache_dir=self.cache_dir.name)
 
     def tearDown(self):
         self.patcher_client.stop()
-        self.patcher_pygame.stop()
-        self.patcher_os.stop()
+        self.patcher_sd.stop()
+        self.cache_dir.cleanup()
 
     def test_01_initialization(self):
         """Test Case 1: Initialization Default Values"""
@@ -37,6 +39,13 @@ class TestRubyTTS(unittest.TestCase):
         self.assertEqual(self.tts.speaking_rate, 0.75)
         self.mock_client_class.assert_called()
 
+    def test_01a_rejects_compressed_encoding(self):
+        """Test Case 1a: Only LINEAR16 output is accepted"""
+        print("\n[Test 1a] Verifying Audio Encoding...")
+        from utiles.tts import texttospeech
+        with self.assertRaises(ValueError):
+            RubyTTS(audio_encoding=texttospeech.AudioEncoding.MP3)
+
     def test_02_update_language(self):
         """Test Case 2: Language Switching Logic"""
         print("\n[Test 2] Verifying Language Update...")
@@ -46,38 +55,157 @@ class TestRubyTTS(unittest.TestCase):
         self.assertEqual(self.tts.language_code, "ml-IN")
         self.assertEqual(self.tts.voice.name, "ml-IN-Standard-A")
         
+        # Configs are reused when switching back
+        ml_voice, ml_audio_config = self.tts.voice, self.tts.audio_config
+        self.tts.update_language("en-IN")
+        self.tts.update_language("ml-IN")
+        self.assertIs(self.tts.voice, ml_voice)
+        self.assertIs(self.tts.audio_config, ml_audio_config)
+        
         # Test invalid switch (should fallback to en-IN)
         self.tts.update_language("invalid-lang")
         self.assertEqual(self.tts.language_code, "en-IN")
 
+    def _wav_bytes(self, samples):
+        """Build a LINEAR16 WAV payload like the one returned by Google TTS."""
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(24000)
+            wav.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+        return buf.getvalue()
+
     def test_03_text_to_speech_flow(self):
-        """Test Case 3: Syntax -> Write -> Play Flow"""
+        """Test Case 3: Synthesis -> Queue -> Play Flow"""
         print("\n[Test 3] Verifying Synthesis Flow...")
         
         # Mock API response
         mock_response = MagicMock()
-        mock_response.audio_content = b"fake_audio_bytes"
+        mock_response.audio_content = self._wav_bytes([1, 2, 3, 4, 5])
         self.tts.client.synthesize_speech.return_value = mock_response
         
-        # Mock file writing
-        with patch("builtins.open", mock_open()) as mock_file:
-            # Mock pygame busy loop (busy once, then not busy)
-            self.mock_pygame.mixer.music.get_busy.side_effect = [True, False]
-            
+        # Output stream opened once at init
+        self.mock_sd.OutputStream.assert_called_once()
+        self.assertEqual(self.mock_sd.OutputStream.call_args.kwargs["blocksize"], 128)
+        self.mock_sd.OutputStream.return_value.start.assert_called_once()
+        
+        # Skip waiting on the (mocked) audio device
+        with patch.object(self.tts._drained, "wait"):
             self.tts.text_to_speech("Hello")
-            
-            # 1. Check API called
-            self.tts.client.synthesize_speech.assert_called()
-            
-            # 2. Check file written
-            mock_file().write.assert_called_with(b"fake_audio_bytes")
-            
-            # 3. Check pygame load and play
-            self.mock_pygame.mixer.music.load.assert_called()
-            self.mock_pygame.mixer.music.play.assert_called()
-            
-            # 4. Check clean up
-            self.mock_os.remove.assert_called()
+        
+        # 1. Check API called
+        self.tts.client.synthesize_speech.assert_called()
+        
+        # 2. Check samples queued without touching the disk
+        self.assertEqual(len(self.tts._frames), 1)
+        np.testing.assert_array_equal(self.tts._frames[0], [1, 2, 3, 4, 5])
+        
+        # 3. Callback plays the queued samples then pads with silence
+        outdata = np.full((8, 1), -1, dtype=np.int16)
+        self.tts._playback_callback(outdata, 8, None, None)
+        np.testing.assert_array_equal(outdata[:, 0], [1, 2, 3, 4, 5, 0, 0, 0])
+        self.assertTrue(self.tts._drained.is_set())
+
+    def test_03a_non_blocking_queue(self):
+        """Test Case 3a: Non-blocking calls queue audio back-to-back"""
+        print("\n[Test 3a] Verifying Gapless Queueing...")
+        mock_response = MagicMock()
+        mock_response.audio_content = self._wav_bytes([7, 7])
+        self.tts.client.synthesize_speech.return_value = mock_response
+        
+        self.tts.text_to_speech("One.", block=False)
+        self.tts.text_to_speech("Two.", block=False)
+        self.assertEqual(len(self.tts._frames), 2)
+        self.assertFalse(self.tts.wait(timeout=0))
+        
+        # Both sentences are played in a single callback without a gap
+        outdata = np.zeros((4, 1), dtype=np.int16)
+        self.tts._playback_callback(outdata, 4, None, None)
+        np.testing.assert_array_equal(outdata[:, 0], [7, 7, 7, 7])
+        
+        # The next callback runs dry and wakes any waiter
+        self.tts._playback_callback(outdata, 4, None, None)
+        self.assertTrue(self.tts.wait(timeout=0))
+
+    def test_03b_stop_flushes_playback(self):
+        """Test Case 3b: Stop drops queued audio"""
+        print("\n[Test 3b] Verifying Stop...")
+        self.tts._frames.append(np.arange(1, 10, dtype=np.int16))
+        self.tts._drained.clear()
+        
+        self.tts.stop()
+        
+        outdata = np.full((4, 1), -1, dtype=np.int16)
+        self.tts._playback_callback(outdata, 4, None, None)
+        np.testing.assert_array_equal(outdata[:, 0], [0, 0, 0, 0])
+        self.assertTrue(self.tts._drained.is_set())
+
+    def test_03c_streaming_synthesis(self):
+        """Test Case 3c: Streamed chunks are queued as they arrive"""
+        print("\n[Test 3c] Verifying Streaming Synthesis...")
+        self.tts.streaming = True
+        chunks = [MagicMock(audio_content=np.array([1, 2], dtype=np.int16).tobytes()),
+                  MagicMock(audio_content=np.array([3], dtype=np.int16).tobytes())]
+        self.tts.client.streaming_synthesize.return_value = iter(chunks)
+
+        self.tts.text_to_speech("Hello", block=False)
+
+        self.tts.client.synthesize_speech.assert_not_called()
+        requests = list(self.tts.client.streaming_synthesize.call_args.kwargs["requests"])
+        self.assertEqual(requests[0].streaming_config.voice.name, "en-IN-Chirp3-HD-Aoede")
+        self.assertEqual(requests[1].input.text, "Hello")
+        self.assertEqual(len(self.tts._frames), 2)
+
+        outdata = np.zeros((4, 1), dtype=np.int16)
+        self.tts._playback_callback(outdata, 4, None, None)
+        np.testing.assert_array_equal(outdata[:, 0], [1, 2, 3, 0])
+
+    def test_03c1_stop_during_streaming(self):
+        """Test Case 3c1: Stop discards chunks still arriving from the stream"""
+        print("\n[Test 3c1] Verifying Stop Mid-Stream...")
+        self.tts.streaming = True
+        chunk = np.array([1, 2], dtype=np.int16).tobytes()
+        def responses(requests=None):
+            yield MagicMock(audio_content=chunk)
+            self.tts.stop() # Barge-in while the sentence is still being synthesized
+            yield MagicMock(audio_content=chunk)
+            yield MagicMock(audio_content=chunk)
+        self.tts.client.streaming_synthesize.side_effect = responses
+
+        self.tts.text_to_speech("Hello", block=False)
+
+        self.assertEqual(len(self.tts._frames), 0)
+        self.assertTrue(self.tts._drained.is_set())
+        self.assertEqual(os.listdir(self.cache_dir.name), [])
+
+        # A reply started after the stop plays normally
+        self.tts.client.streaming_synthesize.side_effect = None
+        self.tts.client.streaming_synthesize.return_value = iter([MagicMock(audio_content=chunk)])
+        self.tts.text_to_speech("Next", block=False)
+        self.assertEqual(len(self.tts._frames), 1)
+
+    def test_03d_phrase_cache(self):
+        """Test Case 3d: Repeated phrases are served from the disk cache"""
+        print("\n[Test 3d] Verifying Phrase Cache...")
+        mock_response = MagicMock()
+        mock_response.audio_content = self._wav_bytes([4, 5, 6])
+        self.tts.client.synthesize_speech.return_value = mock_response
+        self.tts.cache_size = 2
+
+        self.tts.text_to_speech("Switching language.", block=False)
+        self.tts.text_to_speech("Switching language.", block=False)
+        self.tts.client.synthesize_speech.assert_called_once()
+        np.testing.assert_array_equal(self.tts._frames[1], [4, 5, 6])
+
+        # A different speaking rate is a different cache entry
+        self.tts.update_speaking_rate(1.0)
+        self.tts.text_to_speech("Switching language.", block=False)
+        self.assertEqual(self.tts.client.synthesize_speech.call_count, 2)
+
+        # Least recently used entries are evicted beyond cache_size
+        self.tts.text_to_speech("Searching.", block=False)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 2)
 
     def test_04_utility_methods(self):
         """Test Case 4: Helper Methods"""
@@ -0,0 +1,8 @@
+# Shared HTTP connection pools for all OpenAI traffic (chat models and embeddings).
+import httpx
+
+# Keep a few connections alive between turns so requests skip the TLS handshake
+_LIMITS = httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300)
+
+http_client = httpx.Client(limits=_LIMITS, timeout=30)
+http_async_client = httpx.AsyncClient(limits=_LIMITS, timeout=30)
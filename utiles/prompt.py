@@ -1,5 +1,9 @@
-# Standard System Prompt for Ruby
-system_prompt = """
+from typing import Final
+
+# Standard System Prompt for Ruby.
+# Sent verbatim as the first message of every request: never .format() it or add
+# per-turn data, so the prefix stays byte-identical and OpenAI can cache it.
+system_prompt: Final[str] = """
 You are Ruby, a semi-humanoid robot who helps teachers and students,you can convey emotions with your hands, navigate within buildings autonomously, 
 you act as an ideal teacher making learning joyful with personalization for each student, 
 activities and integrated LMS for teacher support. You can also change your way of delivering the content based on the grade and response of the student. 
@@ -1,16 +1,44 @@
 # RubyRAG class for document processing and retrieval using FAISS.
 import os
+import math
+import time
+import threading
+from glob import glob
+from collections import OrderedDict
+from functools import lru_cache
 from dotenv import load_dotenv
 from typing import List, Optional
 
+import faiss
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from utiles.openai_http import http_client, http_async_client
 
 load_dotenv()
 
+# File types picked up when ingesting a whole folder
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+# OpenAI accepts up to 2048 inputs per embeddings request
+EMBED_BATCH_SIZE = 2048
+
+# One embeddings client per model, shared by every RubyRAG instance
+_EMBED_SINGLETONS: dict[str, OpenAIEmbeddings] = {}
+
+def _get_embeddings(model: str) -> OpenAIEmbeddings:
+    """Returns the shared embeddings client for `model`, creating it on first use."""
+    if model not in _EMBED_SINGLETONS:
+        _EMBED_SINGLETONS[model] = OpenAIEmbeddings(
+            model=model,
+            chunk_size=EMBED_BATCH_SIZE, # Keep each add_documents batch in a single request
+            max_retries=3,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+    return _EMBED_SINGLETONS[model]
+
 class RubyRAG:
     """
     RubyRAG class for document processing and retrieval using FAISS.
@@ -20,10 +48,14 @@ class RubyRAG:
         embedding_model (str): Embedding model to use.
         chunk_size (int): Size of text chunks.
         chunk_overlap (int): Overlap between text chunks.
+        cache_size (int): Number of query contexts kept in memory.
+        ivf_threshold (int): Number of vectors above which the flat index is compressed to IVF-PQ.
+        pq_m (int): Number of PQ sub-quantizers (must divide the embedding dimension).
+        nprobe (int): Number of IVF lists scanned per query.
     
     usage:
         rag = RubyRAG()
-        rag.add_documents("docs/knowledge.pdf")
+        rag.add_documents("docs/knowledge.pdf")  # or a folder: rag.add_documents("docs/")
         response = rag.query("What is the main topic?")
         print(response)
     """
@@ -33,15 +65,31 @@ class RubyRAG:
         embedding_model: str = "text-embedding-3-small",
         chunk_size: int = 600,
         chunk_overlap: int = 80,
-        
+        cache_size: int = 256,
+        ivf_threshold: int = 10_000,
+        pq_m: int = 16,
+        nprobe: int = 8,
     ):
 
         self.db_path = db_path # Path to the FAISS database
-        self.embedding_model = OpenAIEmbeddings(model=embedding_model) # Embedding model to use
+        self.embedding_model = _get_embeddings(embedding_model) # Embedding model to use (shared)
+        # Recurring questions skip the embedding round-trip and the index search
+        self._embed_query = lru_cache(maxsize=512)(self.embedding_model.embed_query)
+        self._ctx_cache = OrderedDict() # (normalized query, k) -> context string
+        self.cache_size = cache_size
+        self.ivf_threshold = ivf_threshold
+        self.pq_m = pq_m
+        self.nprobe = nprobe
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size, 
             chunk_overlap=chunk_overlap)
         self.vectorstore = None # FAISS vector store
+        # Saves run on a background thread; bursts of adds collapse into one write
+        self.save_delay = 0.25
+        self._save_lock = threading.Lock()
+        self._save_pending = False
+        self._save_thread = None
+        self._index_lock = threading.Lock() # Serializes index mutation and writes
         # Load existing DB if present
         if os.path.exists(db_path):
             print(f"Loading FAISS DB from {db_path}")
@@ -75,27 +123,137 @@ class RubyRAG:
         docs = loader.load()
         return self.text_splitter.split_documents(docs)
     
-    def add_documents(self, file_path: str):
+    def _collect_files(self, path: str) -> List[str]:
+        """
+        Resolve a file or folder path to the list of files to ingest.
+
+        Args:
+            path (str): Path to a document file or a folder of documents.
+
+        Returns:
+            List[str]: Supported files found (recursively for folders).
+        """
+        if not os.path.isdir(path):
+            return [path]
+
+        files = []
+        for ext in SUPPORTED_EXTENSIONS:
+            files.extend(glob(os.path.join(path, "**", f"*{ext}"), recursive=True))
+        return sorted(files)
+
+    def add_documents(self, path: str):
         """
         Add documents to the FAISS vector store.
 
+        All chunks from every file are embedded together in batches of
+        EMBED_BATCH_SIZE, so ingesting a folder costs one embeddings request
+        per batch rather than one per file.
+
         Args:
-            file_path (str): Path to the document file.
+            path (str): Path to a document file or a folder of documents.
         """
-        docs = self._load_documents(file_path)
-        if self.vectorstore is None:
-            print("Creating new FAISS DB")
-            self.vectorstore = FAISS.from_documents(
-                docs,
-                self.embedding_model,
-            )
-        else:
-            print("Adding documents to existing FAISS DB")
-            self.vectorstore.add_documents(docs)
-        
-        self.vectorstore.save_local(self.db_path)
+        docs = []
+        for file_path in self._collect_files(path):
+            docs.extend(self._load_documents(file_path))
+        if not docs:
+            print(f"No documents found at {path}")
+            return
+
+        texts = [doc.page_content for doc in docs]
+        metadatas = [doc.metadata for doc in docs]
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors.extend(self.embedding_model.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+        text_embeddings = list(zip(texts, vectors))
+
+        with self._index_lock:
+            if self.vectorstore is None:
+                print("Creating new FAISS DB")
+                self.vectorstore = FAISS.from_embeddings(
+                    text_embeddings,
+                    self.embedding_model,
+                    metadatas=metadatas,
+                )
+            else:
+                print("Adding documents to existing FAISS DB")
+                self.vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+            
+            self._compress_index()
+        self._ctx_cache.clear() # Cached contexts may miss the new documents
+        self._schedule_save()
         print(f"Documents added to FAISS DB at {self.db_path}")
 
+    def _schedule_save(self):
+        """Mark the store dirty and make sure a background writer will persist it."""
+        with self._save_lock:
+            self._save_pending = True
+            if self._save_thread is None:
+                # Non-daemon, so a pending write still completes at interpreter exit
+                self._save_thread = threading.Thread(target=self._save_worker)
+                self._save_thread.start()
+
+    def _save_worker(self):
+        """
+        Write the store after a short coalescing window, until no save is pending.
+
+        A failed write is logged and left pending, so the next scheduled save retries it.
+        """
+        try:
+            while True:
+                time.sleep(self.save_delay)
+                with self._save_lock:
+                    if not self._save_pending:
+                        self._save_thread = None
+                        return
+                    self._save_pending = False
+                with self._index_lock:
+                    try:
+                        self.vectorstore.save_local(self.db_path)
+                    except Exception as e:
+                        print("FAISS save error:", e)
+                        with self._save_lock:
+                            self._save_pending = True
+                        return
+        finally:
+            # Clear the writer on every exit path, unless a new one has already replaced it
+            with self._save_lock:
+                if self._save_thread is threading.current_thread():
+                    self._save_thread = None
+
+    def flush(self):
+        """Block until all scheduled saves have been written to disk."""
+        while True:
+            with self._save_lock:
+                thread = self._save_thread
+            if thread is None:
+                return
+            thread.join()
+
+    def _compress_index(self):
+        """
+        Replace a large flat index with an IVF-PQ index.
+
+        A flat index scans every vector per query; IVF-PQ only scans `nprobe`
+        lists of compact PQ codes. Small stores stay flat, since IVF-PQ needs
+        enough vectors to train and gains nothing there.
+        """
+        index = self.vectorstore.index
+        if isinstance(index, faiss.IndexIVF) or index.ntotal < self.ivf_threshold:
+            return
+        if index.d % self.pq_m:
+            print(f"Skipping IVF-PQ: dimension {index.d} is not divisible by pq_m={self.pq_m}")
+            return
+
+        print(f"Compressing FAISS index ({index.ntotal} vectors) to IVF-PQ")
+        vectors = index.reconstruct_n(0, index.ntotal)
+        nlist = max(1, int(4 * math.sqrt(index.ntotal)))
+        quantizer = faiss.IndexFlat(index.d, index.metric_type)
+        ivf = faiss.IndexIVFPQ(quantizer, index.d, nlist, self.pq_m, 8, index.metric_type)
+        ivf.train(vectors)
+        # Vectors keep their positions, so the docstore id mapping stays valid
+        ivf.add(vectors)
+        self.vectorstore.index = ivf
+
     def query(self, query: str, k: int = 3) -> str:
         """
         Query the FAISS vector store.
@@ -110,7 +268,17 @@ class RubyRAG:
         if self.vectorstore is None:
             raise RuntimeError("No existing DB found.")
 
-        docs = self.vectorstore.similarity_search(query, k=k)
+        normalized = " ".join(query.lower().split())
+        key = (normalized, k)
+        if key in self._ctx_cache:
+            self._ctx_cache.move_to_end(key)
+            return self._ctx_cache[key]
+
+        if isinstance(self.vectorstore.index, faiss.IndexIVF):
+            self.vectorstore.index.nprobe = self.nprobe
+
+        embedding = self._embed_query(normalized)
+        docs = self.vectorstore.similarity_search_by_vector(embedding, k=k)
 
         context = []
         for i, doc in enumerate(docs, 1):
@@ -118,4 +286,8 @@ class RubyRAG:
                 f"[Context {i}]\n{doc.page_content}"
             )
 
-        return "\n\n---\n\n".join(context)
+        result = "\n\n---\n\n".join(context)
+        self._ctx_cache[key] = result
+        if len(self._ctx_cache) > self.cache_size:
+            self._ctx_cache.popitem(last=False)
+        return result
@@ -3,9 +3,27 @@
 from langchain.tools import BaseTool
 from pydantic import PrivateAttr
 import subprocess
+import threading
+import asyncio
+import atexit
+import socket
+import json
+import time
+import os
 import yt_dlp
 
 
+# IPC socket of the long-lived mpv player
+MPV_SOCKET = "/tmp/ruby-mpv.sock"
+
+# Filler spoken while a video is looked up, per TTS language
+SEARCH_FILLERS = {
+    "en-IN": "Searching for that video.",
+    "ml-IN": "ആ വീഡിയോ തിരയുകയാണ്.",
+    "ta-IN": "அந்த வீடியோவைத் தேடுகிறேன்.",
+}
+
+
 class YouTubeVideoPlayerTool(BaseTool):
     name: str = "youtube_video_player"
     description: str = (
@@ -17,53 +35,127 @@ class YouTubeVideoPlayerTool(BaseTool):
 
 
     _ruby = PrivateAttr()
+    # One idle mpv is kept running and fed over JSON IPC, so videos skip player start-up
+    _player = PrivateAttr(default=None)
+    _player_lock = PrivateAttr(default_factory=threading.Lock)
     def __init__(self, ruby):
         super().__init__()
         self._ruby = ruby
+        # One handler for whichever player is running at exit, however often it was restarted
+        atexit.register(self._terminate_player)
+
+    def _terminate_player(self):
+        """Terminate the mpv player if it is running."""
+        if self._player is not None and self._player.poll() is None:
+            self._player.terminate()
+
+    def _send_command(self, *command):
+        """Send one JSON IPC command to the running player."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(MPV_SOCKET)
+            sock.sendall(json.dumps({"command": list(command)}).encode() + b"\n")
+
+    def stop(self):
+        """Stop the current video; the player itself stays idle for the next one."""
+        self._send_command("stop")
+
+    def warm_up(self, timeout=5):
+        """Start the idle mpv player ahead of the first video."""
+        self._ensure_player(timeout)
+
+    def _ensure_player(self, timeout=5):
+        """Start mpv in idle mode (or restart it if it was closed) and wait for its IPC socket."""
+        with self._player_lock:
+            if self._player is None or self._player.poll() is not None:
+                if os.path.exists(MPV_SOCKET):
+                    os.remove(MPV_SOCKET) # Stale socket from a previous player
+                self._player = subprocess.Popen(
+                    ["mpv", "--idle", f"--input-ipc-server={MPV_SOCKET}", "--fullscreen", "--no-terminal","--ytdl-format=best[ext=mp4]/best","--cache=yes","--cache-secs=5","--demuxer-max-bytes=50M","--demuxer-readahead-secs=2"],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            # Only waits on a fresh start; the socket exists once mpv is up
+            deadline = time.monotonic() + timeout
+            while not os.path.exists(MPV_SOCKET):
+                if self._player.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("mpv player did not start")
+                time.sleep(0.05)
+            return self._player
 
     def _run(self, query: str) -> str:
         """
         Args:
             query (str): The search query for the video.
         """
+        self._announce_search()
+        video = self._extract(query)
+        if video is None:
+            return f"No video found for: {query}"
+        return self._play(video)
+
+    async def _arun(self, query: str) -> str:
+        """
+        Async variant: the blocking yt_dlp lookup and playback run on worker threads.
+
+        Args:
+            query (str): The search query for the video.
+        """
+        self._announce_search()
+        video = await asyncio.to_thread(self._extract, query)
+        if video is None:
+            return f"No video found for: {query}"
+        return await asyncio.to_thread(self._play, video)
+
+    def _announce_search(self):
+        """Speak a short filler while the video is looked up, so the wait is not silent."""
         self._ruby.ruby_state = "Searching Video"
-        # Options for yt_dlp to get the video stream url 
+        filler = SEARCH_FILLERS.get(self._ruby.tts.language_code, SEARCH_FILLERS["en-IN"])
+        # Queued behind the reply sentences already waiting; the speak stage
+        # synthesizes it while the lookup runs
+        self._ruby.say(filler)
+
+    def _extract(self, query: str) -> dict | None:
+        """
+        Returns the flat yt_dlp entry (watch URL and title) of the top search result,
+        or None if the search found nothing.
+
+        Only the search page is fetched: format negotiation and stream resolution
+        are left to mpv's own yt-dlp hook, so the lookup is not done twice.
+        """
         ydl_opts = {
             "quiet": True,
-            "default_search": "ytsearch1",
-            "format": "best[ext=mp4]/best",
+            "no_warnings": True,
             "noplaylist": True,
             "skip_download": True,
-            "extract_flat": False,
-            "js_runtimes": {"node": {}},
-            "youtube_include_dash_manifest": False,
-            "extractor_args": {
-                "youtube": {
-                    "player_client": ["android"]
-                }
-            },
-            "quiet": True,
-            "no_warnings": True,
+            "extract_flat": "in_playlist",
         }
-        # Get the video stream url from youtube using yt_dlp
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Extract the video info from youtube
-            info = ydl.extract_info(query, download=False)
-            video = info["entries"][0]
-            stream_url = video["original_url"]
-        # Play the video using mpv
-        process = subprocess.Popen(
-            ["mpv", "--fullscreen", "--no-terminal","--cache=yes","--cache-secs=5","--demuxer-max-bytes=50M","--demuxer-readahead-secs=2",stream_url],
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-
-        self._ruby.current_video_process = process
-        process.wait()
-        self._ruby.current_video_process = None
-        # Update the Ruby state to playing video
-        self._ruby.ruby_state = "Playing Video"
+            # process=False stops after the search, entries stay unresolved
+            info = ydl.extract_info(f"ytsearch1:{query}", download=False, process=False)
+            return next(iter(info["entries"]), None)
+
+    def _play(self, video: dict) -> str:
+        """Load the video into the idle mpv player and block until it finishes or is closed."""
+        self._ensure_player()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(MPV_SOCKET)
+            sock.sendall(json.dumps({"command": ["loadfile", video["url"]]}).encode() + b"\n")
+            # Update the Ruby state to playing video; current_video.stop() ends it over IPC
+            self._ruby.current_video = self
+            self._ruby.ruby_state = "Playing Video"
+            try:
+                # mpv reports events line by line; the socket closes if the player is quit
+                for line in sock.makefile("r", encoding="utf-8"):
+                    event = json.loads(line)
+                    if event.get("event") == "end-file":
+                        if event.get("reason") == "error":
+                            return f"Could not play: {video['title']}"
+                        if event.get("reason") == "stop":
+                            return f"Stopped playing: {video['title']}"
+                        break
+            finally:
+                self._ruby.current_video = None
         return f"Finished playing: {video['title']}"
 
 class GetAvailableLanguagesTool(BaseTool):
@@ -81,7 +173,7 @@ class GetAvailableLanguagesTool(BaseTool):
         super().__init__()
         self._ruby = ruby
 
-    def _run(self) -> list[str]:
+    def _run(self) -> tuple[str, ...]:
         # Return the list of supported languages
         return self._ruby.tts.get_supported_languages()
 
@@ -1,25 +1,46 @@
 import os
+import collections
+import threading
+import queue
+import time
+import string
+import grpc
 import sounddevice as sd 
 from google.cloud import speech
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Google caps the audio carried by a single streaming request
+MAX_REQUEST_BYTES = 25_600
+# Google ends a streaming recognize call after ~305 s, so streams are rotated before that
+STREAM_LIMIT_SECONDS = 290
+
+def _words(text):
+    """Returns the words of `text`, lowercased and without punctuation."""
+    words = (word.strip(string.punctuation).lower() for word in text.split())
+    return [word for word in words if word]
+
 class RubySTT:
     """
     Ruby Speech-to-Text (STT) Module.
 
     This class handles real-time speech recognition using the Google Cloud Speech-to-Text API.
     It captures audio from the system's microphone using `sounddevice` and streams it to Google's
-    services for transcription.
+    services for transcription. The microphone and a single recognize stream stay open for the
+    whole session (started on the first `listen()`), so turns do not pay stream setup; the stream
+    is rotated in the background before Google's time limit. Call `pause()`/`resume()` around
+    playback so Ruby does not transcribe itself, and `close()` to stop the session.
     """
     def __init__(
         self,
         language_code: str = "en-IN",
         sample_rate: int = 16_000,
-        chunk: int = 100,
+        chunk: int = 1600,
         phrases: list[str] = None,
         phrases_boost: int = 20,
+        stable_dwell_ms: int = 400,
+        min_stability: float = 0.8,
     ):
         """
         Initialize the RubySTT instance.
@@ -27,115 +48,366 @@ class RubySTT:
         Args:
             language_code (str): The language code for recognition (default: 'en-IN').
             sample_rate (int): The sample rate for audio capture (default: 16_000).
-            chunk (int): Audio chunk size for processing (default: 100).
+            chunk (int): Audio chunk size in frames (default: 1600, i.e. 100 ms at 16 kHz).
             phrases (list[str]): Context phrases to improve recognition of specific words.
             phrases_boost (int): Boost value for the context phrases (default: 20).
+            stable_dwell_ms (int): How long an interim transcript must stay unchanged before it is
+                accepted without waiting for the final result (default: 400 ms).
+            min_stability (float): Minimum interim stability for early acceptance (default: 0.8).
         """
         self.phrases = phrases
         self.language_code = language_code
         self.sample_rate = sample_rate
         self.chunk_size = chunk
+        self.stable_dwell_ms = stable_dwell_ms
+        self.min_stability = min_stability
         
         # Configure SpeechContext to boost recognition of specific phrases (e.g., "Ruby")
         self.speech_contexts = ([speech.SpeechContext(phrases=phrases,boost=phrases_boost)]if phrases else None)
         
-        # Define the recognition configuration for Google Cloud
-        self.recognition_config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=self.sample_rate,
-            language_code=self.language_code,
-            enable_automatic_punctuation=True,
-            speech_contexts=self.speech_contexts,
-        )
-        
-        # Define the streaming configuration
-        self.streaming_config = speech.StreamingRecognitionConfig(
-            config=self.recognition_config,
-            single_utterance=False, # Keep connection open for continuous conversation
-            interim_results=True,   # Receive intermediate results for lower latency feeling
-        )
+        # Recognition/streaming configs per language, built on first use
+        self._configs = {}
+        self._apply_language()
         
         # Initialize the Google Cloud Speech Client
         self.client = speech.SpeechClient()
+        # Start connecting the gRPC channel now so the first listen() finds it READY
+        self._channel_ready = grpc.channel_ready_future(self.client.transport.grpc_channel)
+
+        # Ring buffer filled by the audio callback and drained by the request generator.
+        # The callback copies each block into a preallocated slot, so the audio thread
+        # never allocates; two spare slots keep a queued slot from being overwritten.
+        self._ring = collections.deque(maxlen=32) # ~3.2 s of audio at the default chunk size
+        self._slots = [bytearray(self.chunk_size * 2) for _ in range(self._ring.maxlen + 2)]
+        self._slot_index = 0
+        self._ev = threading.Event()
+
+        # Persistent session: a background thread owns the microphone and the recognize stream
+        self.stream_limit = STREAM_LIMIT_SECONDS
+        self._updates = queue.Queue()    # (transcript, is_final, stability) or an exception
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._stream_stop = None         # Ends the current recognize stream when set
+        self._accepted = None            # Interim returned early; its final must not be returned again
+        self._paused = False             # Set by pause() while Ruby speaks; audio is dropped
+        self._generation = 0             # Bumped by pause() so pending hypotheses are discarded
+    
+    def _apply_language(self):
+        """Point the recognition and streaming configs at `self.language_code`."""
+        if self.language_code not in self._configs:
+            # Define the recognition configuration for Google Cloud
+            recognition_config = speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code=self.language_code,
+                enable_automatic_punctuation=True,
+                speech_contexts=self.speech_contexts,
+            )
+            # Define the streaming configuration
+            streaming_config = speech.StreamingRecognitionConfig(
+                config=recognition_config,
+                single_utterance=False, # Keep connection open for continuous conversation
+                interim_results=True,   # Receive intermediate results for lower latency feeling
+            )
+            self._configs[self.language_code] = (recognition_config, streaming_config)
+        self.recognition_config, self.streaming_config = self._configs[self.language_code]
     
     def update_language(self, language_code: str):
         """
         Update the recognition language dynamically.
 
         This allows the agent to switch between languages (e.g., English to Malayalam) 
-        without restarting the application. The client is re-initialized with new configs.
+        without restarting the application. Only the configs change; the client and
+        its gRPC channel are kept, so no reconnect or auth exchange is needed.
 
         Args:
             language_code (str): The new BCP-47 language code.
         """
         self.language_code = language_code
-        self.recognition_config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=self.sample_rate,
-            language_code=self.language_code,
-            enable_automatic_punctuation=True,
-            speech_contexts=self.speech_contexts,
-        )
-        self.streaming_config = speech.StreamingRecognitionConfig(
-            config=self.recognition_config,
-            single_utterance=False,
-            interim_results=True,
-        )
-        self.client = speech.SpeechClient()
-    
-    def _audio_stream(self):
+        self._apply_language()
+        # The open stream was configured for the old language, rotate it
+        self._end_stream()
+
+    def warm_up(self, timeout=5):
+        """Wait for the gRPC channel connection started in __init__ to become READY."""
+        self._channel_ready.result(timeout=timeout)
+
+    def _capture_callback(self, indata, frames, time_info, status):
+        """
+        Audio callback: hands the block to the generator.
+
+        Runs on the realtime audio thread, so it only copies the buffer into the
+        next preallocated slot and signals; no logging, locking or allocation.
         """
-        Generator that yields audio chunks from the microphone.
+        if self._paused:
+            return
+        slot = self._slots[self._slot_index]
+        self._slot_index = (self._slot_index + 1) % len(self._slots)
+        slot[:] = indata
+        self._ring.append(slot)
+        self._ev.set()
+
+    def _audio_stream(self, stop=None):
+        """
+        Generator that yields audio chunks captured by the session's microphone stream.
+
+        Drains the ring buffer filled by `_capture_callback` until `stop` is set
+        (or the generator is closed). Blocks that queued up while gRPC was busy are
+        sent together as one chunk (up to MAX_REQUEST_BYTES), instead of one small
+        request each. Blocks are gathered in one preallocated buffer, so the only
+        allocation per request is the final `bytes` copy.
 
-        Uses the `sounddevice` library to create an input stream.
-        This runs in an infinite loop reading data until the stream is closed.
+        Args:
+            stop (threading.Event, optional): Ends the stream when set; set `_ev` too to wake it.
         
         Yields:
              bytes: Raw audio data in bytes.
         """
-        with sd.InputStream(
-            samplerate=self.sample_rate,
-            channels=1,
-            dtype="int16",
-            blocksize=self.chunk_size,
-        ) as stream:
-            while True:
-                data, _ = stream.read(self.chunk_size)
-                yield data.tobytes()
+        batch = memoryview(bytearray(max(MAX_REQUEST_BYTES, self.chunk_size * 2)))
+        while stop is None or not stop.is_set():
+            try:
+                block = self._ring.popleft()
+            except IndexError:
+                self._ev.clear()
+                # Re-check after clearing so a block appended (or a stop) in between is not missed
+                if not self._ring and (stop is None or not stop.is_set()):
+                    self._ev.wait()
+                continue
+            size = len(block)
+            batch[:size] = block
+            while self._ring and size + len(self._ring[0]) <= MAX_REQUEST_BYTES:
+                block = self._ring.popleft()
+                batch[size:size + len(block)] = block
+                size += len(block)
+            # Protobuf only accepts bytes for audio_content (not memoryview), so the one
+            # copy per request happens here, off the audio thread
+            yield bytes(batch[:size])
         
-    def listen(self) -> str:
+    def _requests(self, stop=None):
+        """
+        Generator that wraps microphone chunks in recognize requests.
+
+        A single request object is reused: gRPC serializes each request before
+        pulling the next one, so only its audio_content needs updating per chunk.
+
+        Args:
+            stop (threading.Event, optional): Ends the request stream when set.
+
+        Yields:
+            StreamingRecognizeRequest: Request carrying the latest audio chunk.
+        """
+        request = speech.StreamingRecognizeRequest()
+        for chunk in self._audio_stream(stop):
+            request.audio_content = chunk
+            yield request
+
+    def _ensure_session(self):
+        """Start the background session (microphone + recognize stream) if it is not running."""
+        with self._session_lock:
+            if self._session is None or not self._session.is_alive():
+                self._closed.clear()
+                self._session = threading.Thread(target=self._run_session, daemon=True)
+                self._session.start()
+
+    def _run_session(self):
+        """
+        Session thread: keeps the microphone open and one recognize stream running.
+
+        Each stream is ended after `stream_limit` seconds (or on a language change)
+        and immediately replaced; audio captured in between waits in the ring
+        buffer, so nothing is lost across the rotation. Errors, including a
+        microphone that cannot be opened, are passed to `listen` and retried.
+        """
+        while not self._closed.is_set():
+            try:
+                self._ring.clear()
+                with sd.RawInputStream(
+                    samplerate=self.sample_rate,
+                    channels=1,
+                    dtype="int16",
+                    blocksize=self.chunk_size,
+                    callback=self._capture_callback,
+                ):
+                    self._run_streams()
+            except Exception as e:
+                self._updates.put(e)
+                self._closed.wait(1) # Pause before reopening the microphone
+
+    def _run_streams(self):
+        """Run recognize streams back to back until the session is closed."""
+        while not self._closed.is_set():
+            if self._paused:
+                # No stream is open while paused; resume() gets a fresh one
+                self._closed.wait(0.05)
+                continue
+            generation = self._generation
+            stop = threading.Event()
+            self._stream_stop = stop
+            if generation != self._generation:
+                continue # Paused before pause() could see this stream
+            rotation = threading.Timer(self.stream_limit, self._end_stream, args=(stop,))
+            rotation.daemon = True
+            rotation.start()
+            try:
+                responses = self.client.streaming_recognize(
+                    config=self.streaming_config,
+                    requests=self._requests(stop),
+                )
+                self._read_responses(responses, generation)
+            except Exception as e:
+                self._updates.put(e)
+                self._closed.wait(1) # Pause before reconnecting
+            finally:
+                rotation.cancel()
+                self._end_stream(stop)
+
+    def _end_stream(self, stop=None):
+        """Close the request stream of the current (or given) recognize call; the server then ends it."""
+        stop = stop or self._stream_stop
+        if stop is not None:
+            stop.set()
+            self._ev.set()
+
+    def _read_responses(self, responses, generation):
+        """
+        Forward each hypothesis to `listen` as (transcript, is_final, stability).
+
+        Runs on the session thread, so `listen` can notice a hypothesis that
+        stopped changing even when no further responses arrive. Responses that
+        arrive after a `pause` are dropped.
+        """
+        for response in responses:
+            if not response.results or generation != self._generation:
+                continue
+            if response.results[0].is_final:
+                self._updates.put((response.results[0].alternatives[0].transcript, True, 1.0))
+                continue
+            # Interim responses split the hypothesis into a stable and an unstable part
+            transcript = "".join(result.alternatives[0].transcript for result in response.results)
+            stability = min(result.stability for result in response.results)
+            self._updates.put((transcript, False, stability))
+
+    def pause(self):
+        """
+        Stop transcribing, e.g. while Ruby speaks, so its own voice is never returned by `listen`.
+
+        Microphone audio is dropped until `resume`. The current stream is ended and
+        its pending hypotheses discarded: Google finalizes the last words only after
+        the audio stops, which would be after the playback.
+        """
+        if self._paused:
+            return
+        self._paused = True
+        self._generation += 1
+        self._end_stream()
+
+    def resume(self):
+        """Transcribe again after `pause`, on a fresh recognize stream."""
+        self._ring.clear()
+        self._paused = False
+
+    def _after_accepted(self, text):
+        """
+        Returns `text` without the interim already returned by `listen`, if it starts with it.
+
+        After an early return the same utterance keeps producing hypotheses (and
+        finally a final result); only words added after the accepted interim are new.
+        Words are compared without case and punctuation, since the final usually
+        punctuates the accepted words ("hi ruby how" -> "Hi Ruby, how").
+        """
+        if not self._accepted:
+            return text
+        accepted = _words(self._accepted)
+        tokens = text.split()
+        matched = 0
+        for index, token in enumerate(tokens):
+            if matched == len(accepted):
+                return " ".join(tokens[index:]).lstrip(string.punctuation + " ")
+            word = _words(token)
+            if not word:
+                continue # Punctuation on its own
+            if word[0] != accepted[matched]:
+                return text
+            matched += 1
+        return "" if matched == len(accepted) else text
+
+    def _drain_updates(self):
+        """
+        Drop hypotheses that queued up since the last `listen` returned.
+
+        In the console loop these were heard while Ruby was thinking, before
+        `pause`. Stream errors are not dropped but raised.
+        """
+        while True:
+            try:
+                update = self._updates.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(update, Exception):
+                raise update
+            if update[1]:
+                self._accepted = None # The utterance it belonged to has ended
+
+    def listen(self, timeout=None) -> str:
         """
         Accurately listen to user input and return the transcribed text.
 
-        1. Starts the microphone stream.
-        2. Sends requests to Google Cloud Speech API.
-        3. Iterates through responses to find the 'final' result.
+        1. Starts the session (microphone + recognize stream) on first use.
+        2. Drops hypotheses that queued up since the previous call.
+        3. Returns the next 'final' result, or an interim one that has stayed unchanged for
+           `stable_dwell_ms` with stability above `min_stability`, which skips the
+           end-of-utterance silence detection. If an interim was returned early, its
+           final only yields the words spoken after it.
+
+        Args:
+            timeout (float, optional): Give up after this many seconds (default: wait forever).
 
         Returns:
-            str: The final transcribed text from the user.
+            str: The final transcribed text from the user, or "" on timeout.
         """
         print("Listening...")
-        # Create a generator of requests containing audio chunks
-        requests = (
-            speech.StreamingRecognizeRequest(audio_content=chunk)
-            for chunk in self._audio_stream()
-        )
-
-        # Send the streaming request to Google Cloud
-        responses = self.client.streaming_recognize(
-            config=self.streaming_config,
-            requests=requests,
-        )
-
-        # Process the stream of responses
-        for response in responses:
-            if not response.results:
-                continue
+        # Drained before a new session starts, so its first hypotheses are never dropped
+        self._drain_updates()
+        self._ensure_session()
 
-            result = response.results[0]
-            # 'is_final' indicates that the API has finished processing this utterance
-            if result.is_final:
-                return result.alternatives[0].transcript
+        dwell = self.stable_dwell_ms / 1000
+        deadline = None if timeout is None else time.monotonic() + timeout
+        transcript, stability, changed = "", 0.0, time.monotonic()
+        hypothesis = "" # Untrimmed interim text behind `transcript`
+        while True:
+            wait = dwell if deadline is None else max(0.0, min(dwell, deadline - time.monotonic()))
+            try:
+                update = self._updates.get(timeout=wait)
+            except queue.Empty:
+                update = None # No new hypothesis; check the current one for stability
+            if isinstance(update, Exception):
+                raise update
+            if update is None and not self._session.is_alive():
+                raise RuntimeError("STT session stopped")
+            if update:
+                text, is_final, stability = update
+                text = self._after_accepted(text)
+                # 'is_final' indicates that the API has finished processing this utterance
+                if is_final:
+                    self._accepted = None
+                    if text:
+                        return text
+                    transcript, stability = "", 0.0
+                elif text != transcript:
+                    transcript, hypothesis, changed = text, update[0], time.monotonic()
+            if (transcript and stability > self.min_stability
+                    and time.monotonic() - changed >= dwell):
+                # Remember the full hypothesis, so its final can be trimmed back to the new words
+                self._accepted = hypothesis
+                return transcript
+            if deadline is not None and time.monotonic() >= deadline:
+                return ""
 
-        return ""
+    def close(self, timeout=2):
+        """Stop the session: end the recognize stream and release the microphone."""
+        self._closed.set()
+        self._end_stream()
+        if self._session is not None:
+            self._session.join(timeout)
     
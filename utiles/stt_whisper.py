@@ -0,0 +1,127 @@
+import collections
+import numpy as np
+import sounddevice as sd
+from faster_whisper import WhisperModel
+
+
+class WhisperSTT:
+    """
+    Ruby On-Device Speech-to-Text (STT) Module.
+
+    Drop-in alternative to `RubySTT` that transcribes locally with `faster-whisper`
+    instead of streaming audio to Google Cloud, removing the network round-trip
+    from every utterance. Audio is captured with `sounddevice` until the speaker
+    goes quiet, then transcribed with greedy decoding and Silero VAD.
+
+    usage:
+        ruby = Ruby(stt=WhisperSTT())
+    """
+    def __init__(
+        self,
+        language_code: str = "en-IN",
+        model_size: str = "base",
+        device: str = "cpu",
+        compute_type: str = "int8",
+        sample_rate: int = 16_000,
+        chunk: int = 1600,
+        silence_threshold: int = 500,
+        silence_ms: int = 800,
+        max_seconds: int = 15,
+    ):
+        """
+        Initialize the WhisperSTT instance.
+
+        Args:
+            language_code (str): The language code for recognition (default: 'en-IN').
+            model_size (str): Whisper model size, e.g. 'base' or 'small' (default: 'base').
+            device (str): Inference device (default: 'cpu').
+            compute_type (str): Weight precision (default: 'int8' quantization).
+            sample_rate (int): The sample rate for audio capture (default: 16_000).
+            chunk (int): Audio block size read from the microphone (default: 1600, i.e. 100 ms).
+            silence_threshold (int): Mean int16 amplitude below which a block counts as silence.
+            silence_ms (int): Trailing silence that ends an utterance (default: 800 ms).
+            max_seconds (int): Upper bound on a single utterance (default: 15 s).
+        """
+        self.language_code = language_code
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk
+        self.silence_threshold = silence_threshold
+        self.silence_ms = silence_ms
+        self.max_seconds = max_seconds
+
+        # int8 weights halve memory traffic compared to float16 on CPU
+        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+
+    def update_language(self, language_code: str):
+        """
+        Update the recognition language dynamically.
+
+        Args:
+            language_code (str): The new BCP-47 language code.
+        """
+        self.language_code = language_code
+
+    def warm_up(self):
+        """Run the model once on silence so the first listen() does not pay initialization cost."""
+        silence = np.zeros(self.sample_rate, dtype=np.float32)
+        list(self.model.transcribe(silence, beam_size=1, language=self.language_code[:2])[0])
+
+    def _record_utterance(self) -> np.ndarray:
+        """
+        Record from the microphone until the speaker stops talking.
+
+        Blocks until speech starts, then keeps recording until `silence_ms` of
+        silence (or `max_seconds` of audio). A short pre-roll keeps the first syllable.
+
+        Returns:
+            np.ndarray: Mono float32 audio in [-1, 1].
+        """
+        blocks_per_second = self.sample_rate / self.chunk_size
+        max_silent_blocks = max(1, int(self.silence_ms / 1000 * blocks_per_second))
+        max_blocks = int(self.max_seconds * blocks_per_second)
+
+        preroll = collections.deque(maxlen=3)
+        frames = []
+        silent_blocks = 0
+        with sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="int16",
+            blocksize=self.chunk_size,
+        ) as stream:
+            while True:
+                data, _ = stream.read(self.chunk_size)
+                loud = np.abs(data).mean() > self.silence_threshold
+                if not frames:
+                    preroll.append(data)
+                    if loud:
+                        frames.extend(preroll)
+                    continue
+
+                frames.append(data)
+                silent_blocks = 0 if loud else silent_blocks + 1
+                if silent_blocks >= max_silent_blocks or len(frames) >= max_blocks:
+                    break
+
+        return np.concatenate(frames)[:, 0].astype(np.float32) / 32768.0
+
+    def listen(self) -> str:
+        """
+        Listen to user input and return the transcribed text.
+
+        1. Records one utterance from the microphone.
+        2. Transcribes it locally with greedy decoding (beam_size=1) and VAD.
+
+        Returns:
+            str: The transcribed text from the user.
+        """
+        print("Listening...")
+        audio = self._record_utterance()
+        segments, _ = self.model.transcribe(
+            audio,
+            beam_size=1,
+            vad_filter=True,
+            vad_parameters={"min_silence_duration_ms": 300},
+            language=self.language_code[:2],
+        )
+        return " ".join(segment.text.strip() for segment in segments).strip()
@@ -1,32 +1,114 @@
 from langchain_core.tools import tool
+from functools import lru_cache
 import serial
 import time
+import ast
+import math
+import operator
+import atexit
+import threading
 from utiles import rag_utiles
 
+# Shared RAG instance so the FAISS index and query caches survive across tool calls
+_rag = None
+# Tools may run concurrently when the model requests several in one step
+_rag_lock = threading.Lock()
+
+def _get_rag():
+    global _rag
+    with _rag_lock:
+        if _rag is None:
+            _rag = rag_utiles.RubyRAG()
+    return _rag
+
+# Serial port kept open across tool calls; opening it resets the Arduino
+_serial = None
+_serial_lock = threading.Lock()
+
+def _get_serial():
+    """Open the Arduino port on first use. Call with `_serial_lock` held."""
+    global _serial
+    if _serial is None:
+        _serial = serial.Serial('/dev/ttyUSB0', 9600, write_timeout=0.1)
+        time.sleep(2) # Wait for the auto-reset, only once per open
+    return _serial
+
+def _close_serial():
+    """Close whichever serial port is open at exit, however often it was reopened."""
+    if _serial is not None:
+        _serial.close()
+
+atexit.register(_close_serial)
+
+# Syntax allowed in calculator expressions: numbers, arithmetic and tuples only
+_CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Tuple, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+)
+_CALC_BINARY_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_CALC_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+# Largest integer a power may produce, so a single expression cannot hang the agent
+_CALC_MAX_BITS = 10_000
+
+@lru_cache(maxsize=512)
+def _parse_expression(expression):
+    """Parse and validate an arithmetic expression; cached per expression string."""
+    tree = ast.parse(expression.strip(), mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _CALC_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float, complex):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+    return tree.body
+
+def _evaluate(node):
+    """Evaluate a validated expression node, bounding the size of every intermediate result."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Tuple):
+        return tuple(_evaluate(element) for element in node.elts)
+    if isinstance(node, ast.UnaryOp):
+        return _CALC_UNARY_OPS[type(node.op)](_evaluate(node.operand))
+
+    left, right = _evaluate(node.left), _evaluate(node.right)
+    if isinstance(node.op, ast.Mult) and (isinstance(left, tuple) or isinstance(right, tuple)):
+        raise ValueError("Tuples cannot be repeated")
+    if (isinstance(node.op, ast.Pow) and isinstance(left, int) and isinstance(right, int)
+            and abs(left) > 1 and right > 0 and right * math.log2(abs(left)) > _CALC_MAX_BITS):
+        raise ValueError(f"Result too large (over {_CALC_MAX_BITS} bits)")
+    return _CALC_BINARY_OPS[type(node.op)](left, right)
+
 @tool
 def calculator(query: str) -> str:
     """Evaluates a basic mathematical expression provided as a string. 
-    Supports arithmetic operations like addition, subtraction, multiplication, division, and parentheses."""
+    Supports arithmetic operations like addition, subtraction, multiplication, division, powers, and parentheses."""
     try:
-        return str(eval(query))
+        return str(_evaluate(_parse_expression(query)))
     except Exception as e:
         return str(e)
 
 @tool
 def arduino_serial_communication(query: str) -> str:
     """Communicates with an Arduino device via serial connection."""
-    try:
-        ser = serial.Serial('/dev/ttyUSB0', 9600)
-        time.sleep(2)
-        ser.write(query.encode())
-        return "Arduino Serial Communication Successful"
-    except Exception as e:
-        return str(e)
+    global _serial
+    with _serial_lock:
+        try:
+            _get_serial().write(query.encode())
+            return "Arduino Serial Communication Successful"
+        except Exception as e:
+            # Drop a failed port (e.g. unplugged) so the next call reopens it
+            if _serial is not None:
+                _serial.close()
+                _serial = None
+            return str(e)
 
 @tool
 def query_document(query: str) -> str:
-    """Queries a document using the RobiRAG class."""
+    """Queries a document using the RubyRAG class."""
     try:
-        return rag_utiles.RobiRAG().query(query)
+        return _get_rag().query(query)
     except Exception as e:
         return str(e)
\ No newline at end of file
@@ -1,60 +1,86 @@
 from google.cloud import texttospeech
 from dotenv import load_dotenv
+import collections
+import threading
+import wave
+import io
 import os
-import pygame
+import hashlib
+import numpy as np
+import sounddevice as sd
 
 
 load_dotenv()
-pygame.init()
+
+# Configuration for supported languages (Indian Context)
+LANGUAGE_CONFIG = {
+    'en-IN': {
+        'voice_name': 'en-IN-Standard-D',  # Preferred English voice
+        'streaming_voice_name': 'en-IN-Chirp3-HD-Aoede',  # Streaming synthesis needs a Chirp 3 HD voice
+        'gender': texttospeech.SsmlVoiceGender.FEMALE,
+        'speaking_rate': 0.75
+    },
+    'ml-IN': {
+        'voice_name': 'ml-IN-Standard-A',  # Preferred Malayalam voice
+        'streaming_voice_name': 'ml-IN-Chirp3-HD-Aoede',
+        'gender': texttospeech.SsmlVoiceGender.FEMALE,
+        'speaking_rate': 0.75
+    },
+    'ta-IN': {
+        'voice_name': 'ta-IN-Standard-A',  # Preferred Tamil voice
+        'streaming_voice_name': 'ta-IN-Chirp3-HD-Aoede',
+        'gender': texttospeech.SsmlVoiceGender.FEMALE,
+        'speaking_rate': 0.75
+    }
+}
+# The supported set is static, so it is computed once at import
+SUPPORTED_LANGUAGES = tuple(LANGUAGE_CONFIG)
 
 class RubyTTS:
     """
     Ruby Text-to-Speech (TTS) Module.
 
     This class handles converting text responses into spoken audio using the Google Cloud Text-to-Speech API.
-    It supports multiple languages (English, Malayalam, Tamil) and manages audio playback using `pygame`.
+    It supports multiple languages (English, Malayalam, Tamil) and plays audio through a persistent
+    `sounddevice` output stream fed with raw PCM. Synthesized phrases are memoized on disk, so repeated
+    phrases (confirmations, fillers, errors) are played without an API call.
     
     Attributes:
         language_config (dict): Configuration for supported languages including voice name and gender.
         client (TextToSpeechClient): Google Cloud TTS client.
-        cache_dir (str): Directory to temporarily store generated audio files.
+        cache_dir (str): Directory holding the memoized PCM of synthesized phrases.
         sample_rate_hertz (int): Audio sample rate for playback (default: 24000).
     """
     def __init__(self,
     language="en-IN",
-    audio_encoding=texttospeech.AudioEncoding.MP3,
+    audio_encoding=texttospeech.AudioEncoding.LINEAR16,
     sample_rate_hertz=24000,
     cache_dir=".cache",
-    speaking_rate=None
+    speaking_rate=None,
+    streaming=False,
+    cache_size=200,
+    blocksize=128
     ):
         """
         Initialize the RubyTTS instance.
 
         Args:
             language (str): Default language code (e.g., 'en-IN').
-            audio_encoding (AudioEncoding): Audio format (default: MP3).
+            audio_encoding (AudioEncoding): Audio format. Only LINEAR16 is supported, since the
+                output stream plays raw PCM and compressed formats would need a decode per utterance.
             sample_rate_hertz (int): Audio sample rate (default: 24000).
-            cache_dir (str): Path to store temporary audio files (default: '.cache').
+            cache_dir (str): Path for the synthesized audio cache (default: '.cache').
             speaking_rate (float, optional): Speed of speech (0.25 to 4.0). Overrides language defaults if set.
+            streaming (bool): Use `streaming_synthesize` so playback starts on the first audio chunk
+                instead of after the whole sentence is synthesized (default: False).
+            cache_size (int): Maximum number of cached phrases, least recently used evicted first
+                (default: 200, 0 disables the cache).
+            blocksize (int): Frames per output callback (default: 128, ~5 ms at 24 kHz). Small blocks
+                keep the device buffer short, so speech starts and stops within a few ms.
         """
-        # Configuration for supported languages (Indian Context)
-        self.language_config = {
-            'en-IN': {
-                'voice_name': 'en-IN-Standard-D',  # Preferred English voice
-                'gender': texttospeech.SsmlVoiceGender.FEMALE,
-                'speaking_rate': 0.75
-            },
-            'ml-IN': {
-                'voice_name': 'ml-IN-Standard-A',  # Preferred Malayalam voice
-                'gender': texttospeech.SsmlVoiceGender.FEMALE,
-                'speaking_rate': 0.75
-            },
-            'ta-IN': {
-                'voice_name': 'ta-IN-Standard-A',  # Preferred Tamil voice
-                'gender': texttospeech.SsmlVoiceGender.FEMALE,
-                'speaking_rate': 0.75
-            }
-        }
+        if audio_encoding != texttospeech.AudioEncoding.LINEAR16:
+            raise ValueError("RubyTTS plays raw PCM; audio_encoding must be LINEAR16")
+        self.language_config = LANGUAGE_CONFIG
         
         # Initialize Google Cloud Client and Audio Settings
         self.client = texttospeech.TextToSpeechClient() 
@@ -62,28 +88,53 @@ class RubyTTS:
         self.audio_encoding = audio_encoding 
         self.cache_dir = cache_dir 
         self.sample_rate_hertz = sample_rate_hertz 
+        self.streaming = streaming
+        self.cache_size = cache_size
+        # Open the gRPC channel in the background so init does not block on the network
+        self._warm_thread = threading.Thread(target=self._open_channel, daemon=True)
+        self._warm_thread.start()
         
         # Determine speaking rate: use argument if provided, else fall back to language default
         if speaking_rate is not None:
             self.speaking_rate = speaking_rate
         else:
             self.speaking_rate = self.language_config[language]['speaking_rate']
-            
-        os.makedirs(self.cache_dir, exist_ok=True) # Ensure cache directory exists
 
-        # Configure Voice Params (Language, Name, Gender)
-        self.voice = texttospeech.VoiceSelectionParams(
-            language_code=self.language_code,
-            name=self.language_config[language]['voice_name'],
-            ssml_gender=self.language_config[language]['gender'],
-        )
-        
-        # Configure Audio Params (Encoding, Sample Rate, Speed)
-        self.audio_config = texttospeech.AudioConfig(
-            audio_encoding=self.audio_encoding,
-            sample_rate_hertz=self.sample_rate_hertz,
-            speaking_rate=self.speaking_rate,
+        # Pre-build Voice Params (Language, Name, Gender) for every language once
+        self._voice_by_lang = {
+            lang: texttospeech.VoiceSelectionParams(
+                language_code=lang,
+                name=config['voice_name'],
+                ssml_gender=config['gender'],
+            )
+            for lang, config in self.language_config.items()
+        }
+        # Audio and streaming configs, built once per speaking rate / (language, rate)
+        self._audio_configs = {}
+        self._streaming_configs = {}
+        self._apply_config()
+
+        # Playback queue consumed by the output stream callback
+        self._frames = collections.deque()
+        self._current = None    # PCM block currently being played
+        self._offset = 0        # Samples of the current block already played
+        self._flush = False     # Set by stop() to drop the current block
+        self._drained = threading.Event()
+        self._drained.set()
+        # Bumped by stop(); audio synthesized for an older generation is discarded
+        self._generation = 0
+        self._queue_lock = threading.Lock()
+
+        # Keep one output stream open so playback starts on the next callback
+        self._stream = sd.OutputStream(
+            samplerate=self.sample_rate_hertz,
+            channels=1,
+            dtype="int16",
+            blocksize=blocksize,
+            latency="low",
+            callback=self._playback_callback,
         )
+        self._stream.start()
     
     def update_language(self, language, speaking_rate=None):
         """
@@ -108,17 +159,7 @@ class RubyTTS:
             self.speaking_rate = speaking_rate
         else:
             self.speaking_rate = self.language_config[language]['speaking_rate']
-            
-        self.voice = texttospeech.VoiceSelectionParams(
-            language_code=self.language_code,
-            name=self.language_config[language]['voice_name'],
-            ssml_gender=self.language_config[language]['gender'],
-        )
-        self.audio_config = texttospeech.AudioConfig(
-            audio_encoding=self.audio_encoding,
-            sample_rate_hertz=self.sample_rate_hertz,
-            speaking_rate=self.speaking_rate,
-        )
+        self._apply_config()
     
     def update_speaking_rate(self, speaking_rate):
         """
@@ -128,71 +169,244 @@ class RubyTTS:
             speaking_rate (float): New speaking rate (0.25 to 4.0).
         """
         self.speaking_rate = speaking_rate
-        self.audio_config = texttospeech.AudioConfig(
-            audio_encoding=self.audio_encoding,
-            sample_rate_hertz=self.sample_rate_hertz,
-            speaking_rate=self.speaking_rate,
-        )
+        self._apply_config()
+
+    def _apply_config(self):
+        """Point the voice and audio config at the current language and speaking rate."""
+        self.voice = self._voice_by_lang[self.language_code]
+        if self.speaking_rate not in self._audio_configs:
+            # Configure Audio Params (Encoding, Sample Rate, Speed)
+            self._audio_configs[self.speaking_rate] = texttospeech.AudioConfig(
+                audio_encoding=self.audio_encoding,
+                sample_rate_hertz=self.sample_rate_hertz,
+                speaking_rate=self.speaking_rate,
+            )
+        self.audio_config = self._audio_configs[self.speaking_rate]
     
+    def _open_channel(self, timeout=5):
+        """Open the gRPC channel with a cheap call so the first synthesis skips connection setup."""
+        try:
+            self.client.list_voices(language_code=self.language_code, timeout=timeout)
+        except Exception as e:
+            print("TTS warm-up error:", e)
+
+    def warm_up(self, timeout=5):
+        """Wait for the background channel warm-up started in __init__."""
+        self._warm_thread.join(timeout)
+
     def get_current_language(self):
         """Returns the currently active BCP-47 language code."""
         return self.language_code
     
     def get_supported_languages(self):
-        """Returns a list of all supported language codes."""
-        return list(self.language_config.keys())
+        """Returns a tuple of all supported language codes."""
+        return SUPPORTED_LANGUAGES
+
+    def _playback_callback(self, outdata, frames, time_info, status):
+        """
+        Output stream callback: copies queued PCM into the device buffer.
 
-    def text_to_speech(self, text):
+        Runs on the audio thread, so it only moves samples and never blocks.
+        Silence is written once the queue runs dry.
+        """
+        if self._flush:
+            self._current = None
+            self._flush = False
+
+        filled = 0
+        while filled < frames:
+            if self._current is None or self._offset >= len(self._current):
+                try:
+                    self._current = self._frames.popleft()
+                except IndexError:
+                    self._current = None
+                    break
+                self._offset = 0
+            n = min(frames - filled, len(self._current) - self._offset)
+            outdata[filled:filled + n, 0] = self._current[self._offset:self._offset + n]
+            self._offset += n
+            filled += n
+
+        if filled < frames:
+            outdata[filled:] = 0
+            self._drained.set()
+
+    def _decode(self, audio_content):
+        """Returns the PCM samples of a LINEAR16 (WAV) response as an int16 array."""
+        with wave.open(io.BytesIO(audio_content), "rb") as wav:
+            pcm = wav.readframes(wav.getnframes())
+        return np.frombuffer(pcm, dtype=np.int16)
+
+    def _streaming_config(self):
+        """Returns the streaming synthesis config for the current language and speaking rate."""
+        key = (self.language_code, self.speaking_rate)
+        if key not in self._streaming_configs:
+            self._streaming_configs[key] = texttospeech.StreamingSynthesizeConfig(
+                voice=texttospeech.VoiceSelectionParams(
+                    language_code=self.language_code,
+                    name=self.language_config[self.language_code]['streaming_voice_name'],
+                ),
+                streaming_audio_config=texttospeech.StreamingAudioConfig(
+                    audio_encoding=texttospeech.AudioEncoding.PCM,
+                    sample_rate_hertz=self.sample_rate_hertz,
+                    speaking_rate=self.speaking_rate,
+                ),
+            )
+        return self._streaming_configs[key]
+
+    def _cache_path(self, text):
+        """Returns the cache file for `text` in the current voice, or None if caching is off."""
+        if not self.cache_size:
+            return None
+        if self.streaming:
+            voice_name = self.language_config[self.language_code]['streaming_voice_name']
+        else:
+            voice_name = self.voice.name
+        key = f"{self.language_code}|{voice_name}|{self.speaking_rate}|{self.sample_rate_hertz}|{text}"
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".pcm")
+
+    def _cache_load(self, path):
+        """Returns the cached samples at `path`, or None on a miss."""
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            samples = np.fromfile(path, dtype=np.int16)
+            os.utime(path) # Mark as recently used for eviction
+        except OSError as e:
+            print("TTS cache error:", e)
+            return None
+        return samples
+
+    def _cache_store(self, path, samples):
+        """Write samples to the cache and evict the least recently used files beyond `cache_size`."""
+        if path is None or not len(samples):
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            samples.tofile(path)
+            entries = sorted(
+                (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".pcm")),
+                key=lambda entry: entry.stat().st_mtime,
+            )
+            for entry in entries[:-self.cache_size]:
+                os.remove(entry.path)
+        except OSError as e:
+            print("TTS cache error:", e)
+
+    def _enqueue(self, samples, generation):
+        """
+        Queue samples for playback unless stop() was called since `generation` was taken.
+
+        Returns:
+            bool: False if the audio was discarded because playback was stopped.
+        """
+        with self._queue_lock:
+            if generation != self._generation:
+                return False
+            self._frames.append(samples)
+            self._drained.clear()
+            return True
+
+    def _stream_synthesis(self, text, generation):
+        """
+        Synthesize with `streaming_synthesize`, queueing each audio chunk as it arrives.
+
+        Responses carry headerless PCM, so every chunk goes straight onto the
+        output stream and playback overlaps with the rest of the synthesis.
+
+        Args:
+            text (str): The text message to speak.
+            generation (int): Stop generation taken before the request.
+
+        Returns:
+            np.ndarray: All samples received, for the cache, or None if stop() interrupted the stream.
+        """
+        # The first request carries the config, the following ones the text
+        requests = iter([
+            texttospeech.StreamingSynthesizeRequest(streaming_config=self._streaming_config()),
+            texttospeech.StreamingSynthesizeRequest(input=texttospeech.StreamingSynthesisInput(text=text)),
+        ])
+        chunks = []
+        for response in self.client.streaming_synthesize(requests=requests):
+            chunks.append(np.frombuffer(response.audio_content, dtype=np.int16))
+            # Drained is cleared per chunk, since the callback may empty the queue between chunks
+            if not self._enqueue(chunks[-1], generation):
+                return None # Stopped mid-sentence: drop the rest of the stream
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+    def text_to_speech(self, text, block=True):
         """
         Synthesize text to speech and play it immediately.
 
         1. Validates input text.
-        2. Sends request to Google Cloud TTS API.
-        3. Saves the audio content to a temporary cache file.
-        4. Plays the audio using Pygame mixer.
-        5. Deletes the cache file after playback.
+        2. Looks the phrase up in the on-disk cache.
+        3. On a miss, sends request to Google Cloud TTS API (streamed if `streaming` is set)
+           and caches the result.
+        4. Queues the PCM samples on the open output stream.
+        5. Blocks until playback finishes (or is stopped), unless block=False.
+
+        With block=False the audio is appended behind whatever is already
+        playing, so consecutive sentences play back-to-back without gaps while
+        the next one is being synthesized. Use `wait()` to block afterwards.
 
         Args:
             text (str): The text message to speak.
+            block (bool): Wait for playback to finish before returning (default: True).
         """
         if not text or not isinstance(text, str):
             print("No text provided for synthesis.")
             return None
         
-        input_text = texttospeech.SynthesisInput(text=text)
-        
-        # Request speech synthesis
-        response = self.client.synthesize_speech(
-            input=input_text,
-            voice=self.voice,
-            audio_config=self.audio_config,
-        )
-        
-        # Save audio stream to a temporary cache file
-        # Using first 5 chars of text in filename to avoid filesystem issues with long names
-        safe_text_snippet = "".join(x for x in text[:5] if x.isalnum())
-        cache_file = os.path.join(self.cache_dir, f"{self.language_code}_{safe_text_snippet}.mp3")
-        
-        with open(cache_file, "wb") as out:
-            out.write(response.audio_content)
-        
-        # Load and play the audio file
-        pygame.mixer.music.load(cache_file)
-        pygame.mixer.music.play()
+        # Taken before the request, so audio arriving after a stop() is not played
+        generation = self._generation
+        cache_path = self._cache_path(text)
+        samples = self._cache_load(cache_path)
+        if samples is not None:
+            # Cache hit: no API call at all
+            self._enqueue(samples, generation)
+        else:
+            if self.streaming:
+                samples = self._stream_synthesis(text, generation)
+            else:
+                # Request speech synthesis
+                response = self.client.synthesize_speech(
+                    input=texttospeech.SynthesisInput(text=text),
+                    voice=self.voice,
+                    audio_config=self.audio_config,
+                )
+                
+                # Queue the samples; the stream callback starts playing them on its next block
+                samples = self._decode(response.audio_content)
+                self._enqueue(samples, generation)
+            # Written after queueing, so the disk write never delays playback
+            if samples is not None:
+                self._cache_store(cache_path, samples)
         
-        # Block until playback finishes (simple loop with Clock tick)
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+        if block:
+            self.wait()
 
-        # Cleanup: Remove the temporary file
-        try:
-            os.remove(cache_file)
-        except OSError:
-            pass # Ignore if file is already gone or locked
+    def wait(self, timeout=None):
+        """
+        Block until everything queued has been played (or playback is stopped).
+
+        The output callback sets an event as soon as the queue runs dry, so this
+        wakes within one audio block of the end of speech instead of polling.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait (default: no limit).
+
+        Returns:
+            bool: True if playback finished, False if the timeout expired first.
+        """
+        return self._drained.wait(timeout)
 
     def stop(self):
-        """Immediately stop any currently playing audio."""
-        pygame.mixer.music.stop()
+        """Immediately stop any currently playing audio, including audio still being synthesized."""
+        with self._queue_lock:
+            self._generation += 1
+            self._frames.clear()
+            self._flush = True
+            self._drained.set()
 
 
-            
\ No newline at end of file